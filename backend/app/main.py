@@ -7,6 +7,9 @@ import os
 from .database import engine
 from . import models
 from .routers import upload, dashboard, email, ml_analysis, chatbot
+from .services.model_registry import get_registry
+from .services.report_jobs import get_report_queue
+from .services.llm_client import get_llm_client
 
 
 # Create tables
@@ -32,6 +35,20 @@ app.include_router(chatbot.router)
 # Create uploads directory
 os.makedirs("uploads", exist_ok=True)
 
+@app.on_event("startup")
+def load_model():
+    # Warm the shared model registry once per worker instead of retraining on every request
+    get_registry().activate()
+
+@app.on_event("startup")
+def start_report_workers():
+    # Report jobs interrupted by a restart are requeued before the workers start
+    get_report_queue().start()
+
+@app.on_event("shutdown")
+def stop_report_workers():
+    get_report_queue().stop(timeout=5)
+
 @app.get("/")
 def read_root():
     return {"message": "BPAi Loan Dashboard API is running!"}
@@ -39,3 +56,8 @@ def read_root():
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
+
+@app.get("/health/llm")
+def llm_metrics():
+    # Per-route LLM call counts, latency percentiles and token usage since the process started
+    return get_llm_client().metrics.snapshot()
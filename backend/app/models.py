@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Float, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Text, Float, JSON, Index
 from sqlalchemy.sql import func
 from .database import Base
 from pydantic import BaseModel
@@ -24,6 +24,50 @@ class DashboardData(Base):
     row_data = Column(JSON)  # Store CSV row as JSON
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+class ApplicationExplanation(Base):
+    __tablename__ = "application_explanations"
+    __table_args__ = (
+        # One stored analysis per application, session and model version; also the lookup index
+        Index("ix_application_explanations_lookup", "session_id", "application_id", "model_version", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String, nullable=False)
+    application_id = Column(String, nullable=False)
+    model_version = Column(String, nullable=False)
+    predicted_category = Column(String)
+    confidence_score = Column(Float)
+    probabilities = Column(JSON)  # {category: probability}
+    lime_features = Column(JSON)  # Top LIME features as [{feature, impact, description}]
+    shap_features = Column(JSON)  # Top SHAP features, same shape
+    five_c_scores = Column(JSON)  # {Character, Capacity, Capital, Collateral, Conditions}
+    improvements = Column(JSON)
+    ai_summary = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ReportJob(Base):
+    __tablename__ = "report_jobs"
+    __table_args__ = (
+        # Workers claim the oldest queued job
+        Index("ix_report_jobs_status_created", "status", "created_at"),
+    )
+    
+    id = Column(String, primary_key=True)  # uuid4 hex
+    session_id = Column(String, nullable=False)  # applications file the report is generated from
+    application_id = Column(String, nullable=False, index=True)
+    model_version = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="queued")  # queued, running, succeeded, failed
+    stage = Column(String, default="queued")  # see services/loan_application.py REPORT_STAGES
+    progress = Column(Float, default=0.0)  # 0..1
+    attempts = Column(Integer, default=0)
+    worker_id = Column(String)
+    report_key = Column(String)  # artifact cache key of the finished PDF
+    error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    heartbeat_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
 
 from pydantic import BaseModel
 from typing import Optional
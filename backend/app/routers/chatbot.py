@@ -3,20 +3,15 @@ from fastapi import FastAPI, HTTPException, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional
-import google.generativeai as genai
-import os
 from datetime import datetime
 import json
 
-# Configure Gemini API
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY environment variable is required")
+from ..services.llm_client import get_llm_client
+from ..services.llm_providers import get_model
+from ..services.application_index import get_application_index
 
-genai.configure(api_key=GEMINI_API_KEY)
-
-# Initialize Gemini model
-model = genai.GenerativeModel('gemini-1.5-flash')
+# Model of the configured LLM provider that answers chat messages
+MODEL_NAME = 'gemini-1.5-flash'
 
 # Pydantic models
 class ChatMessage(BaseModel):
@@ -33,24 +28,32 @@ class ChatResponse(BaseModel):
     response: str
     timestamp: datetime
 
-def load_application_data():
-    base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
-    json_path = os.path.join(base_dir, "applications.json")
-    with open(json_path, 'r') as f:
-        data = json.load(f)
-        return data
-
-DASHBOARD_DATA = json.dumps(load_application_data(), indent=2)
-
-def create_system_prompt():
-    """Create the system prompt with dashboard context"""
-    application_data = load_application_data()
-    dashboard_json = json.dumps(application_data, indent=2)
+def find_relevant_applications(user_message: str, conversation_history: List[ChatMessage] = None):
+    """Applications the message refers to; follow-up questions fall back to the earlier user messages"""
+    index = get_application_index()
+    records, total = index.search(user_message)
+    if not records and conversation_history:
+        for msg in reversed(conversation_history[-10:]):
+            if msg.type == "user":
+                records, total = index.search(msg.content)
+                if records:
+                    break
+    return records, total
+
+def create_system_prompt(user_message: str = "", conversation_history: List[ChatMessage] = None):
+    """Create the system prompt with the portfolio summary and the applications the question refers to"""
+    index = get_application_index()
+    records, total = find_relevant_applications(user_message, conversation_history)
+    summary_json = json.dumps(index.summary(), separators=(",", ":"))
+    records_json = json.dumps(records, separators=(",", ":")) if records else "None of the applications match this question."
     
     return f"""You are BPAi, a dashboard assistant for a risk assessment system. You help users understand their dashboard data, risk scoring, and application statuses.
 
-DASHBOARD DATA:
-{dashboard_json}
+DASHBOARD SUMMARY (all applications):
+{summary_json}
+
+MATCHING APPLICATIONS ({len(records)} of {total} matches shown):
+{records_json}
 
 RISK SCORING MODEL:
 - Pass (Low Risk) - Green status
@@ -67,9 +70,10 @@ KEY CAPABILITIES:
 
 RESPONSE GUIDELINES:
 - Be helpful and professional
-- Use the dashboard data to provide accurate information
+- Use the dashboard summary for portfolio-wide questions and the matching applications for specific cases
 - Format responses clearly with emojis and structure
-- If asked about applications not in the data, say they're not found
+- If asked about an application or client that is not among the matching applications, say it was not found
+- If only some of the matches are shown, say how many there are and suggest narrowing the question
 - Always base responses on the actual dashboard data provided
 - Use markdown formatting for better readability
 
@@ -94,15 +98,12 @@ async def get_gemini_response(user_message: str, conversation_history: List[Chat
             "parts": [user_message]
         })
         
-        # Create chat with system instruction
-        chat = model.start_chat(history=conversation_context[:-1])
-        
-        # Send message with system context
-        system_prompt = create_system_prompt()
+        # Send the question with the system context after the earlier turns
+        system_prompt = create_system_prompt(user_message, conversation_history)
         full_prompt = f"{system_prompt}\n\nUser Question: {user_message}"
+        conversation_context[-1]["parts"] = [full_prompt]
         
-        response = chat.send_message(full_prompt)
-        return response.text
+        return await get_llm_client().generate_async(get_model(MODEL_NAME), conversation_context, route="chatbot")
         
     except Exception as e:
         print(f"Error calling Gemini API: {e}")
@@ -140,21 +141,11 @@ async def chat_endpoint(request: ChatRequest):
 @router.get("/dashboard/data")
 async def get_dashboard_data():
     """Get dashboard data"""
-    return {"data": DASHBOARD_DATA}
+    index = get_application_index()
+    index.refresh()
+    return {"data": index.records}
 
 @router.get("/dashboard/stats")
 async def get_dashboard_stats():
     """Get dashboard statistics"""
-    total_apps = len(DASHBOARD_DATA)
-    avg_risk = sum(app["riskScore"] for app in DASHBOARD_DATA) / total_apps
-    
-    status_counts = {}
-    for app in DASHBOARD_DATA:
-        status = app["status"]
-        status_counts[status] = status_counts.get(status, 0) + 1
-    
-    return {
-        "total_applications": total_apps,
-        "average_risk_score": round(avg_risk, 1),
-        "status_distribution": status_counts
-    }
+    return get_application_index().summary()
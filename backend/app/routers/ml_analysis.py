@@ -1,11 +1,33 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response, Request, Depends
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from typing import Dict, List
-from ..services.loan_application import DetailedProcessor
-import os
+from typing import Dict, List, Optional
+from .. import models
+from ..database import get_db
+from ..services.chart_rendering import CHARTS
+from ..services.model_registry import get_registry
+from ..services.analysis_store import lookup_analysis, save_analysis
+from ..services.artifact_cache import get_artifact_cache
+from ..services.report_jobs import enqueue_report, job_status, get_report_queue, ACTIVE_STATUSES
+from ..services.bulk_reports import write_reports_zip, report_filename
+import asyncio
+import tempfile
 
 router = APIRouter(prefix="/api/ml", tags=["ml-analysis"])
 
+# Applications served by the analysis endpoints; also the session key for stored analyses
+APPLICATIONS_CSV_PATH = "backend/sample_data/apps_synthetic_data_200.csv"
+
+def session_processor(artifact):
+    """
+    The DetailedProcessor of APPLICATIONS_CSV_PATH under a model version, shared with the
+    report workers, so the file is read and encoded once rather than on every request
+    """
+    return get_report_queue().processor(APPLICATIONS_CSV_PATH, artifact.version)
+
 class LimeFeature(BaseModel):
     feature: str
     impact: float
@@ -22,28 +44,67 @@ class MLAnalysisResponse(BaseModel):
     fiveCAnalysis: Dict[str, float]
     improvements: List[str]
     aiSummary: str
-
-class FileResponse(BaseModel):
-    path: str
-    filename: str
-    media_type: str
+    modelVersion: Optional[str] = None
+    shapFeatures: List[LimeFeature] = []
 
 @router.get("/health")
 async def ml_health_check():
     """Check ML model health"""
+    registry = get_registry()
     return {
         "status": "healthy",
-        "model_type": "JSON-based loan screening"
+        "model_type": "JSON-based loan screening",
+        "model_version": registry.active_version
     }
 
 
+class ModelActivateRequest(BaseModel):
+    version: Optional[str] = None
+
+@router.get("/model")
+async def get_model_info():
+    """List the active, loaded and available model versions"""
+    registry = get_registry()
+    return {
+        "active_version": registry.active_version,
+        "loaded_versions": registry.loaded_versions(),
+        "available_versions": registry.available_versions()
+    }
+
+@router.post("/model/activate")
+def activate_model(request: ModelActivateRequest):
+    """Hot-swap the served model; in-flight requests finish on the version they started with"""
+    try:
+        artifact = get_registry().activate(request.version)
+        return {"active_version": artifact.version}
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.post("/analysis", response_model=MLAnalysisResponse)
 async def analyze_application(
     request: MLAnalysisRequest,
+    response: Response,
+    db: Session = Depends(get_db)
 ):    
     try:
-        detailed_processor = DetailedProcessor("backend/sample_data/apps_synthetic_data_200.csv")
-        analysis_result = detailed_processor.process_specific_application(request.application_id)     
+        artifact = get_registry().get()
+        response.headers["X-Model-Version"] = artifact.version
+
+        # Serve a stored analysis when this application was already analysed under this model
+        stored = await run_in_threadpool(lookup_analysis, db, APPLICATIONS_CSV_PATH, request.application_id,
+                                         artifact.version)
+        if stored is not None:
+            response.headers["X-Analysis-Cache"] = "hit"
+            return stored
+
+        response.headers["X-Analysis-Cache"] = "miss"
+        detailed_processor = await run_in_threadpool(session_processor, artifact)
+        analysis_result = await run_in_threadpool(detailed_processor.process_specific_application,
+                                                  request.application_id)
+        await run_in_threadpool(save_analysis, db, APPLICATIONS_CSV_PATH, request.application_id, analysis_result)
         return analysis_result
         
     except ValueError as e:
@@ -60,125 +121,255 @@ class ReportResponse(BaseModel):
     success: bool
     message: str
     application_id: str
+    model_version: Optional[str] = None
+    job_id: Optional[str] = None
+
+# Session ZIPs are kept in memory up to this size, then spill to a temporary file
+ZIP_SPOOL_BYTES = 32 * 1024 * 1024
+
+# How long /generate-report waits for its job before answering 504
+REPORT_WAIT_SECONDS = 300
+REPORT_WAIT_POLL_SECONDS = 0.5
 
 @router.post("/generate-report", response_model=ReportResponse)
-async def generate_report_endpoint(request: ReportRequest):
-    """Generate a comprehensive ML analysis report for an application"""
+async def generate_report_endpoint(request: ReportRequest, response: Response, db: Session = Depends(get_db)):
+    """
+    Generate a comprehensive ML analysis report for an application and wait for it.
+    The work runs on the report job queue; use /report-jobs to get a job ID without waiting.
+    """
+    # The session is synchronous, so every query runs in the threadpool rather than on the event loop
+    job = await run_in_threadpool(enqueue_report, db, request.application_id, APPLICATIONS_CSV_PATH)
+    response.headers["X-Model-Version"] = job.model_version
+    response.headers["X-Report-Job"] = job.id
+
+    waited = 0.0
+    while job.status in ACTIVE_STATUSES and waited < REPORT_WAIT_SECONDS:
+        await asyncio.sleep(REPORT_WAIT_POLL_SECONDS)
+        waited += REPORT_WAIT_POLL_SECONDS
+        await run_in_threadpool(db.refresh, job)
+
+    if job.status == "succeeded":
+        return ReportResponse(
+            success=True,
+            message="Report generated successfully",
+            application_id=request.application_id,
+            model_version=job.model_version,
+            job_id=job.id
+        )
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=f"Report generation failed: {job.error}")
+    raise HTTPException(
+        status_code=504,
+        detail=f"Report is still being generated (stage {job.stage}); poll /api/ml/report-jobs/{job.id}"
+    )
+
+@router.post("/report-jobs", status_code=202)
+def create_report_job(request: ReportRequest, db: Session = Depends(get_db)):
+    """Queue a report and return its job ID right away"""
+    return job_status(enqueue_report(db, request.application_id, APPLICATIONS_CSV_PATH))
+
+@router.get("/report-jobs/{job_id}")
+def get_report_job(job_id: str, db: Session = Depends(get_db)):
+    """Status, current stage and progress (0..1) of a report job"""
+    job = db.get(models.ReportJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Report job {job_id} not found")
+    return job_status(job)
+
+@router.get("/report-jobs/{job_id}/download")
+def download_report_job(job_id: str, request: Request, db: Session = Depends(get_db)):
+    """Stream the PDF of a finished report job"""
+    job = db.get(models.ReportJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Report job {job_id} not found")
+    if job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Report job {job_id} is {job.status} (stage {job.stage})")
+
+    report_path = get_artifact_cache().get(job.report_key, ".pdf")
+    if report_path is None:
+        raise HTTPException(status_code=410, detail=f"The report of job {job_id} was evicted; queue it again")
+    with open(report_path, "rb") as f:
+        pdf = f.read()
+    response = pdf_response(request, pdf, job.report_key, f"report_{job.application_id}.pdf")
+    response.headers["X-Model-Version"] = job.model_version
+    return response
+
+@router.get("/chart/{application_id}/{chart}")
+def get_chart(application_id: str, chart: str):
+    """PNG of one explanation chart (lime, shap or five_c), drawn only when requested"""
+    if chart not in CHARTS:
+        raise HTTPException(status_code=404, detail=f"Unknown chart {chart}; expected one of {list(CHARTS)}")
     try:
-        # Initialize the DetailedProcessor with CSV path
-        detailed_processor = DetailedProcessor("backend/sample_data/apps_synthetic_data_200.csv")
-        
-        # Generate the report
-        success = detailed_processor.generate_report(request.application_id)
-        
-        if success:
-            return ReportResponse(
-                success=True,
-                message="Report generated successfully",
-                application_id=request.application_id
-            )
-        else:
-            raise HTTPException(
-                status_code=500, 
-                detail="Report generation failed"
-            )
-            
+        artifact = get_registry().get()
+        chart_path = session_processor(artifact).render_chart(application_id, chart)
+        with open(chart_path, "rb") as f:
+            content = f.read()
+        return Response(content=content, media_type="image/png", headers={"X-Model-Version": artifact.version})
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        print(f"Report generation error: {str(e)}")
-        raise HTTPException(
-            status_code=500, 
-            detail=f"Report generation failed: {str(e)}"
+        print(f"Chart rendering error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Chart rendering failed: {str(e)}")
+
+# Chunk size of streamed report bodies
+PDF_STREAM_CHUNK_BYTES = 64 * 1024
+
+def _iter_chunks(content):
+    for start in range(0, len(content), PDF_STREAM_CHUNK_BYTES):
+        yield content[start:start + PDF_STREAM_CHUNK_BYTES]
+
+def _parse_range(range_header, size):
+    """(start, end) of a single "bytes=" range, inclusive; None for a malformed or multi-range header"""
+    unit, _, spec = range_header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first == "":  # suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                return None
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+def pdf_response(request: Request, content: bytes, etag: str, filename: str):
+    """
+    Stream an in-memory PDF with Content-Disposition, a strong ETag, conditional GET
+    (If-None-Match) and single byte-range (Range / If-Range) support.
+    """
+    etag = f'"{etag}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Cache-Control": "private, no-cache",
+    }
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    size = len(content)
+    range_header = request.headers.get("range")
+    if range_header and request.headers.get("if-range", etag) == etag:
+        byte_range = _parse_range(range_header, size)
+        if byte_range is None or byte_range[0] >= size:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        start, end = byte_range
+        return StreamingResponse(
+            _iter_chunks(content[start:end + 1]),
+            status_code=206,
+            media_type="application/pdf",
+            headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)}
         )
 
+    return StreamingResponse(_iter_chunks(content), media_type="application/pdf",
+                             headers={**headers, "Content-Length": str(size)})
+
+@router.post("/generate-report/download")
+def generate_and_download_report(report_request: ReportRequest, request: Request):
+    """Generate (or reuse) a report and stream the PDF in the same call, straight from memory"""
+    try:
+        artifact = get_registry().get()
+        pdf, report_key = session_processor(artifact).report_pdf(report_request.application_id)
+    except Exception as e:
+        print(f"Report generation error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Report generation failed: {str(e)}")
+
+    response = pdf_response(request, pdf, report_key, f"report_{report_request.application_id}.pdf")
+    response.headers["X-Model-Version"] = artifact.version
+    return response
+
 @router.get("/download-report/{application_id}")
-async def download_report_endpoint(application_id: str):
+def download_report_endpoint(application_id: str, request: Request):
     """Download the generated report for an application"""
     try:
-        # with filename format: report_{application_id}.pdf
-        report_filename = f"report_{application_id}.pdf"
-        report_path = os.path.join("outdir", report_filename)
-        
-        print(f"Looking for report at: {report_path}")
-        
-        # Check if report exists
-        if not os.path.exists(report_path):
-            # Try alternative locations and naming patterns
-            alternative_paths = [
-                os.path.join("backend", "outdir", report_filename),
-                os.path.join("outdir", f"full_report_{application_id}.pdf"),
-                os.path.join("outdir", f"{application_id}_report.pdf"),
-                os.path.join("outputs", report_filename),
-                os.path.join("reports", report_filename)
-            ]
-            
-            found_file = None
-            for alt_path in alternative_paths:
-                if os.path.exists(alt_path):
-                    found_file = alt_path
-                    print(f"Found report at alternative path: {alt_path}")
-                    break
-            
-            if not found_file:
-                # List files in outdir for debugging
-                outdir_path = "outdir"
-                if os.path.exists(outdir_path):
-                    files_in_outdir = os.listdir(outdir_path)
-                    print(f"Files in outdir: {files_in_outdir}")
-                    
-                    # Look for any PDF with the application_id
-                    matching_files = [f for f in files_in_outdir if application_id in f and f.endswith('.pdf')]
-                    if matching_files:
-                        found_file = os.path.join(outdir_path, matching_files[0])
-                        print(f"Found matching file: {found_file}")
-            
-            if not found_file:
-                raise HTTPException(
-                    status_code=404, 
-                    detail=f"Report not found for application {application_id}. Expected at: {report_path}"
-                )
-            
-            report_path = found_file
-        
-        # Return the file
-        return FileResponse(
-            path=report_path,
-            filename=os.path.basename(report_path),
-            media_type='application/pdf'
-        )
-        
-    except FileNotFoundError:
-        raise HTTPException(
-            status_code=404, 
-            detail=f"Report file not found for application {application_id}"
-        )
+        artifact = get_registry().get()
+        pdf, report_key = session_processor(artifact).stored_report(application_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown application {application_id}")
     except Exception as e:
         print(f"Report download error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to download report: {str(e)}")
+
+    if pdf is None:
         raise HTTPException(
-            status_code=500, 
-            detail=f"Failed to download report: {str(e)}"
+            status_code=404,
+            detail=f"No report for application {application_id} under model {artifact.version}; generate it first"
         )
+    response = pdf_response(request, pdf, report_key, f"report_{application_id}.pdf")
+    response.headers["X-Model-Version"] = artifact.version
+    return response
+
+class SessionReportsRequest(BaseModel):
+    application_ids: Optional[List[str]] = None
+
+@router.post("/session-reports", status_code=202)
+def create_session_reports(request: SessionReportsRequest, db: Session = Depends(get_db)):
+    """
+    Queue reports for every application of the session (or the given IDs). Returns a
+    manifest of report jobs; the job queue shares one processor, and so one SHAP batch,
+    per session and rate-limits Gemini calls.
+    """
+    artifact = get_registry().get()
+    application_ids = request.application_ids
+    if application_ids is None:
+        application_ids = list(session_processor(artifact).encoded_df.index)
+    jobs = [enqueue_report(db, application_id, APPLICATIONS_CSV_PATH, artifact.version)
+            for application_id in application_ids]
+    return {
+        "session_id": APPLICATIONS_CSV_PATH,
+        "model_version": artifact.version,
+        "jobs": [job_status(job) for job in jobs]
+    }
+
+@router.get("/session-reports/zip")
+def download_session_reports(db: Session = Depends(get_db)):
+    """ZIP of the session's finished reports under the active model, with a manifest.json of all applications"""
+    artifact = get_registry().get()
+    jobs = db.query(models.ReportJob).filter(
+        models.ReportJob.session_id == APPLICATIONS_CSV_PATH,
+        models.ReportJob.model_version == artifact.version
+    ).order_by(models.ReportJob.created_at).all()
+
+    # Latest job per application
+    latest = {job.application_id: job for job in jobs}
+    manifest = [
+        {"application_id": job.application_id, "status": job.status, "report_key": job.report_key,
+         "file": report_filename(job.application_id) if job.status == "succeeded" else None, "error": job.error}
+        for job in latest.values()
+    ]
+    archive = tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_BYTES)
+    write_reports_zip(manifest, archive, artifact.version)
+    archive.seek(0)
+    return StreamingResponse(
+        iter(lambda: archive.read(PDF_STREAM_CHUNK_BYTES), b""),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="session_reports.zip"',
+                 "X-Model-Version": artifact.version},
+        background=BackgroundTask(archive.close)
+    )
 
-# Optional: Get report status endpoint
 @router.get("/report-status/{application_id}")
-async def get_report_status(application_id: str):
-    """Check if a report exists for an application"""
+def get_report_status(application_id: str, db: Session = Depends(get_db)):
+    """Latest report job of an application and whether its report can be downloaded"""
+    job = db.query(models.ReportJob).filter(
+        models.ReportJob.session_id == APPLICATIONS_CSV_PATH,
+        models.ReportJob.application_id == application_id
+    ).order_by(models.ReportJob.created_at.desc()).first()
+
+    report_exists = False
     try:
-        report_filename = f"full_report_{application_id}.pdf"
-        report_paths = [
-            os.path.join("reports", report_filename),
-            os.path.join("outputs", report_filename)
-        ]
-        
-        report_exists = any(os.path.exists(path) for path in report_paths)
-        
-        return {
-            "application_id": application_id,
-            "report_exists": report_exists,
-            "report_filename": report_filename if report_exists else None
-        }
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, 
-            detail=f"Failed to check report status: {str(e)}"
-        )
\ No newline at end of file
+        report_exists = session_processor(get_registry().get()).stored_report(application_id)[0] is not None
+    except KeyError:
+        pass
+
+    return {
+        "application_id": application_id,
+        "report_exists": report_exists,
+        "latest_job": job_status(job) if job else None
+    }
@@ -0,0 +1,108 @@
+import argparse
+
+from sqlalchemy.exc import IntegrityError
+
+from .. import models
+from ..database import SessionLocal, engine
+from .loan_application import DetailedProcessor, MLAnalysisResponse
+from .model_registry import get_registry
+
+
+def to_response(record):
+    """Rebuild the /analysis response from a stored ApplicationExplanation row"""
+    return MLAnalysisResponse(
+        riskCategory=record.predicted_category,
+        confidenceScore=record.confidence_score,
+        probabilities=record.probabilities,
+        limeFeatures=record.lime_features,
+        fiveCAnalysis=record.five_c_scores,
+        improvements=record.improvements,
+        aiSummary=record.ai_summary,
+        modelVersion=record.model_version,
+        shapFeatures=record.shap_features or []
+    )
+
+
+def lookup_analysis(db, session_id, application_id, model_version):
+    """Stored analysis for one application under one model version, or None"""
+    record = db.query(models.ApplicationExplanation).filter(
+        models.ApplicationExplanation.session_id == session_id,
+        models.ApplicationExplanation.application_id == application_id,
+        models.ApplicationExplanation.model_version == model_version
+    ).first()
+    return to_response(record) if record else None
+
+
+def _record(session_id, application_id, analysis):
+    return models.ApplicationExplanation(
+        session_id=session_id,
+        application_id=application_id,
+        model_version=analysis.modelVersion,
+        predicted_category=analysis.riskCategory,
+        confidence_score=float(analysis.confidenceScore),
+        probabilities=analysis.probabilities,
+        lime_features=[feature.model_dump() for feature in analysis.limeFeatures],
+        shap_features=[feature.model_dump() for feature in analysis.shapFeatures],
+        five_c_scores=analysis.fiveCAnalysis,
+        improvements=analysis.improvements,
+        ai_summary=analysis.aiSummary
+    )
+
+
+def save_analysis(db, session_id, application_id, analysis):
+    """Write an analysis through to the store; a concurrent writer having stored it first is fine"""
+    try:
+        db.add(_record(session_id, application_id, analysis))
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+
+
+def populate_session_analyses(db, processor, application_ids=None):
+    """
+    Analyse and store every application of a processor's session (or `application_ids`)
+    that is not stored yet for its model version. Returns the number of analyses written.
+    """
+    query = db.query(models.ApplicationExplanation.application_id).filter(
+        models.ApplicationExplanation.session_id == processor.session_key,
+        models.ApplicationExplanation.model_version == processor.artifact.version
+    )
+    if application_ids is None:
+        application_ids = list(processor.encoded_df.index)
+    else:
+        application_ids = list(application_ids)
+        query = query.filter(models.ApplicationExplanation.application_id.in_(application_ids))
+    stored = {application_id for (application_id,) in query}
+
+    analyses = {application_id: processor.process_specific_application(application_id)
+                for application_id in application_ids if application_id not in stored}
+    try:
+        db.add_all(_record(processor.session_key, application_id, analysis)
+                   for application_id, analysis in analyses.items())
+        db.commit()
+    except IntegrityError:
+        # A concurrent writer stored some of them first; store the rest one at a time
+        db.rollback()
+        for application_id, analysis in analyses.items():
+            save_analysis(db, processor.session_key, application_id, analysis)
+    return len(analyses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute and store /api/ml/analysis results for an applications file")
+    parser.add_argument("csv_path", nargs="?", default="backend/sample_data/apps_synthetic_data_200.csv")
+    parser.add_argument("--model-version", default=None)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+    processor = DetailedProcessor(args.csv_path, artifact=get_registry().get(args.model_version))
+    db = SessionLocal()
+    try:
+        written = populate_session_analyses(db, processor)
+    finally:
+        db.close()
+    print(f"Stored {written} analyses for {args.csv_path} (model {processor.artifact.version})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import os
+import re
+import json
+import threading
+from collections import Counter
+
+# Applications the chatbot answers questions about
+APPLICATIONS_JSON_PATH = os.getenv(
+    "APPLICATIONS_JSON_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "applications.json"))
+)
+# Application records put in one chatbot prompt
+MAX_PROMPT_RECORDS = int(os.getenv("CHATBOT_MAX_RECORDS", "10"))
+
+# Risk level and dashboard color of each risk category, as explained by the chatbot
+RISK_LEVELS = {
+    "Pass": ("Low Risk", "Green"),
+    "Especially Mentioned": ("Medium Risk", "Yellow"),
+    "Substandard": ("Medium Risk", "Yellow"),
+    "Doubtful": ("Medium Risk", "Yellow"),
+    "Loss": ("High Risk", "Red"),
+}
+
+APPLICATION_ID_PATTERN = re.compile(r"\bAPP-[\w-]+", re.IGNORECASE)
+WORD_PATTERN = re.compile(r"[A-Za-z][A-Za-z'-]+")
+
+
+def _words(text):
+    """Lowercased words of a text, without possessive 's"""
+    return [word.lower().removesuffix("'s") for word in WORD_PATTERN.findall(text or "")]
+
+
+def _capitalized(text):
+    """
+    For each word of a text (aligned with _words), whether it is capitalized somewhere
+    other than the start of a sentence, where a capital says nothing about the word
+    """
+    text = text or ""
+    flags = []
+    for match in WORD_PATTERN.finditer(text):
+        before = text[:match.start()].rstrip()
+        flags.append(match.group()[0].isupper() and bool(before) and before[-1] not in ".?!")
+    return flags
+
+
+def applicant_name(record):
+    parts = (record.get("first_name"), record.get("middle_name"), record.get("last_name"))
+    return " ".join(str(part) for part in parts if part)
+
+
+def _status_terms():
+    """
+    Terms that ask for a status, mapped to the risk categories they cover. Returns
+    (multi-word phrases such as "high risk", single words such as "pass" or "red").
+    """
+    phrases, words = {}, {}
+    for category, (level, color) in RISK_LEVELS.items():
+        for term in (category, level, color):
+            terms = phrases if " " in term else words
+            terms.setdefault(term.lower(), set()).add(category)
+    return phrases, words
+
+
+STATUS_PHRASES, STATUS_WORDS = _status_terms()
+# A single status word only counts when capitalized mid-sentence, followed by one of these
+# nouns ("pass applications") or preceded by one of these words ("in pass"), so that
+# "Will this pass?" or "Red flags in the portfolio?" do not pull every Pass or Loss record
+# into the prompt
+STATUS_NOUNS = {"status", "statuses", "application", "applications", "app", "apps", "loan", "loans",
+                "case", "cases", "category", "rating", "client", "clients"}
+STATUS_PREFIXES = {"in", "as", "rated", "classified", "categorized"}
+
+
+class ApplicationIndex:
+    """
+    In-memory index of applications.json by application ID, applicant name and status
+    (risk category), with portfolio aggregates computed once per load. The file is
+    re-read only when its modification time or size changes.
+    """
+
+    def __init__(self, path=APPLICATIONS_JSON_PATH):
+        self.path = path
+        self.records = []
+        self.aggregates = {}
+        self._by_id = {}
+        self._by_name_word = {}
+        self._by_full_name = {}
+        self._by_status = {}
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Reload the index if the file changed since it was built"""
+        stat = os.stat(self.path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature:
+            return
+        with self._lock:
+            if signature == self._signature:
+                return
+            with open(self.path, "r") as f:
+                records = json.load(f)
+            self._build(records)
+            self._signature = signature
+
+    def _build(self, records):
+        by_id, by_name_word, by_full_name, by_status = {}, {}, {}, {}
+        for position, record in enumerate(records):
+            by_id[str(record.get("application_id", "")).upper()] = position
+            for word in set(_words(applicant_name(record))):
+                by_name_word.setdefault(word, []).append(position)
+            full_name = " ".join(_words(f"{record.get('first_name') or ''} {record.get('last_name') or ''}"))
+            by_full_name.setdefault(full_name, []).append(position)
+            by_status.setdefault(record.get("risk_category"), []).append(position)
+
+        self.records = records
+        self._by_id, self._by_name_word, self._by_full_name, self._by_status = by_id, by_name_word, by_full_name, by_status
+        self.aggregates = self._aggregate(records)
+
+    @staticmethod
+    def _aggregate(records):
+        categories = Counter(record.get("risk_category") for record in records)
+        levels = Counter(RISK_LEVELS.get(record.get("risk_category"), ("Unknown",))[0] for record in records)
+        amounts = [record["loan_amount_requested_php"] for record in records
+                   if isinstance(record.get("loan_amount_requested_php"), (int, float))]
+        incomes = [record["gross_monthly_income"] for record in records
+                   if isinstance(record.get("gross_monthly_income"), (int, float))]
+        return {
+            "total_applications": len(records),
+            "status_distribution": dict(categories),
+            "risk_level_distribution": dict(levels),
+            "high_risk_applications": [record.get("application_id") for record in records
+                                       if record.get("risk_category") == "Loss"][:MAX_PROMPT_RECORDS],
+            "total_loan_amount_requested_php": round(sum(amounts), 2),
+            "average_loan_amount_requested_php": round(sum(amounts) / len(amounts), 2) if amounts else None,
+            "average_gross_monthly_income": round(sum(incomes) / len(incomes), 2) if incomes else None,
+            "loan_purposes": dict(Counter(record.get("loan_purpose") for record in records).most_common(5)),
+            "employment_types": dict(Counter(record.get("employment_type") for record in records).most_common(5)),
+        }
+
+    def _name_matches(self, text):
+        """Positions of applicants named in the text: full first+last names first, then capitalized name words"""
+        words = _words(text)
+        matches = []
+        for first, last in zip(words, words[1:]):
+            matches += self._by_full_name.get(f"{first} {last}", [])
+        # Single name words only count when capitalized mid-sentence, so "will" or "mark" in a
+        # question, or "Will" opening one, do not match
+        for word, capitalized in zip(words, _capitalized(text)):
+            if capitalized:
+                matches += self._by_name_word.get(word, [])
+        return matches
+
+    def _status_matches(self, text):
+        capitalized = _capitalized(text)
+        words = _words(text)
+        lowered = f" {' '.join(words)} "
+        categories = set()
+        for phrase, covered in STATUS_PHRASES.items():
+            if f" {phrase} " in lowered:
+                categories |= covered
+        for i, word in enumerate(words):
+            covered = STATUS_WORDS.get(word)
+            if covered is None:
+                continue
+            if (capitalized[i]
+                    or (i + 1 < len(words) and words[i + 1] in STATUS_NOUNS)
+                    or (i > 0 and words[i - 1] in STATUS_PREFIXES)):
+                categories |= covered
+        return [position for category in RISK_LEVELS if category in categories
+                for position in self._by_status.get(category, [])]
+
+    def search(self, text, limit=MAX_PROMPT_RECORDS):
+        """
+        Records a question refers to, by application ID, applicant name or status, in that
+        order of precedence. Returns (up to `limit` records, number of matching records).
+        """
+        self.refresh()
+        with self._lock:
+            return self._search(text, limit)
+
+    def _search(self, text, limit):
+        positions = [self._by_id[application_id.upper()] for application_id in APPLICATION_ID_PATTERN.findall(text or "")
+                     if application_id.upper() in self._by_id]
+        positions += self._name_matches(text)
+        positions += self._status_matches(text)
+        positions = list(dict.fromkeys(positions))
+        return [self.records[position] for position in positions[:limit]], len(positions)
+
+    def summary(self):
+        self.refresh()
+        return self.aggregates
+
+
+application_index = ApplicationIndex()
+
+
+def get_application_index():
+    return application_index
@@ -0,0 +1,139 @@
+import os
+import json
+import hashlib
+import threading
+
+DEFAULT_CACHE_DIR = os.getenv("ARTIFACT_CACHE_DIR", "outdir/cache")
+# Total size the cache may grow to before least recently used artifacts are deleted
+DEFAULT_CACHE_MAX_BYTES = int(os.getenv("ARTIFACT_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+
+def content_key(*parts):
+    """SHA-256 of JSON-serialisable parts; values JSON cannot encode are hashed by their str()"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ArtifactCache:
+    """
+    Size-bounded on-disk cache of generated files (chart PNGs, LLM text, PDFs) named by
+    content key. A hit refreshes the file's mtime; when the total size passes `max_bytes`
+    the files with the oldest mtime are deleted first. Several processes may share the
+    directory: each keeps its own size estimate and tolerates files removed by the others.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._sizes = None
+
+    def path(self, key, suffix):
+        return os.path.join(self.root, key[:2], key + suffix)
+
+    def get(self, key, suffix):
+        """Path of a cached artifact, or None"""
+        path = self.path(key, suffix)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def get_or_create(self, key, suffix, build):
+        """
+        Path of a cached artifact, calling build(tmp_path) to write it on a miss.
+        Concurrent callers for the same key in this process build it once.
+        """
+        path = self.get(key, suffix)
+        if path is not None:
+            return path
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key + suffix, threading.Lock())
+        with key_lock:
+            path = self.get(key, suffix)
+            if path is None:
+                path = self.path(key, suffix)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                try:
+                    build(tmp_path)
+                    os.replace(tmp_path, path)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                self._added(path)
+        with self._lock:
+            self._key_locks.pop(key + suffix, None)
+        return path
+
+    def put_bytes(self, key, suffix, data):
+        def write(tmp_path):
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+        return self.get_or_create(key, suffix, write)
+
+    def get_text(self, key, suffix=".txt"):
+        path = self.get(key, suffix)
+        if path is None:
+            return None
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def put_text(self, key, text, suffix=".txt"):
+        return self.put_bytes(key, suffix, text.encode("utf-8"))
+
+    def _scan(self):
+        sizes = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(".tmp"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    sizes[path] = os.path.getsize(path)
+                except FileNotFoundError:
+                    pass
+        return sizes
+
+    def _added(self, path):
+        with self._lock:
+            if self._sizes is None:
+                self._sizes = self._scan()
+            self._sizes[path] = os.path.getsize(path)
+            if sum(self._sizes.values()) > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Re-read the directory so files written or deleted by other processes are counted
+        self._sizes = self._scan()
+        total = sum(self._sizes.values())
+
+        def last_used(path):
+            try:
+                return os.path.getmtime(path)
+            except FileNotFoundError:
+                return 0
+
+        for path in sorted(self._sizes, key=last_used):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= self._sizes.pop(path)
+
+    def size_bytes(self):
+        with self._lock:
+            self._sizes = self._scan()
+            return sum(self._sizes.values())
+
+
+artifact_cache = ArtifactCache()
+
+
+def get_artifact_cache():
+    return artifact_cache
@@ -0,0 +1,172 @@
+import os
+import json
+import argparse
+
+from .loan_screening import predict_loan_applications
+from .model_registry import get_registry
+from .data_io import iter_applications, scoring_columns
+
+DEFAULT_CHUNK_SIZE = int(os.getenv("SCORING_CHUNK_SIZE", "10000"))
+
+
+def make_records_serializable(df):
+    """
+    Column-wise equivalent of applying make_serializable to every cell:
+    numpy scalars become Python numbers and NaN becomes None.
+    """
+    records_df = df.astype(object).where(df.notna(), None)
+    return records_df.to_dict('records')
+
+
+def score_applications(artifact, raw_df):
+    """
+    Score raw application rows with the artifact's frozen transform and model.
+    Returns the raw rows with risk_category and probabilities appended.
+    """
+    encoded_df = artifact.transform.transform(raw_df)
+    predicted_categories, probabilities = predict_loan_applications(artifact.model, encoded_df)
+
+    result_df = raw_df.copy()
+    result_df["risk_category"] = predicted_categories
+    result_df["probabilities"] = probabilities.tolist()
+    return result_df
+
+
+def iter_application_chunks(path, chunksize=DEFAULT_CHUNK_SIZE, columns=None):
+    """Yield a CSV, Parquet or Arrow applications file as DataFrames of at most `chunksize` rows"""
+    yield from iter_applications(path, chunksize, columns=columns)
+
+
+# --- Output sinks ---
+
+class CSVSink:
+    """Appends scored chunks to a CSV file, writing the header once"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "w", newline="")
+        self._header_written = False
+
+    def write(self, result_df):
+        result_df = result_df.copy()
+        result_df["probabilities"] = [json.dumps(p) for p in result_df["probabilities"]]
+        result_df.to_csv(self._file, header=not self._header_written, index=False)
+        self._header_written = True
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class NDJSONSink:
+    """Appends scored chunks as one JSON object per line"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "w")
+
+    def write(self, result_df):
+        for record in make_records_serializable(result_df):
+            self._file.write(json.dumps(record, default=str) + "\n")
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class DatabaseSink:
+    """Stores scored chunks as DashboardData rows for a session, committing per chunk"""
+
+    def __init__(self, db, session_id):
+        self.db = db
+        self.session_id = session_id
+
+    def write(self, result_df):
+        # Imported here so file-based scoring works without a configured database
+        from .. import models
+
+        self.db.add_all([
+            models.DashboardData(session_id=self.session_id, row_data=record)
+            for record in make_records_serializable(result_df)
+        ])
+        self.db.commit()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is not None:
+            self.db.rollback()
+        self.close()
+
+
+def sink_for_path(path):
+    """Pick a file sink from the output extension"""
+    if path.endswith(".csv"):
+        return CSVSink(path)
+    if path.endswith((".ndjson", ".jsonl")):
+        return NDJSONSink(path)
+    raise ValueError(f"Unsupported output format for {path}; use .csv, .ndjson or .jsonl")
+
+
+def score_stream(artifact, input_path, sink, chunksize=DEFAULT_CHUNK_SIZE, columns=None):
+    """
+    Score an applications file chunk by chunk, writing each chunk to `sink` before
+    reading the next, so peak memory is bounded by `chunksize` rather than the file.
+    `columns` limits which input columns are read (see data_io.scoring_columns).
+
+    Returns a summary with row and chunk counts and the category distribution.
+    """
+    total_rows = 0
+    total_chunks = 0
+    category_counts = {}
+
+    for raw_chunk in iter_application_chunks(input_path, chunksize, columns=columns):
+        result_df = score_applications(artifact, raw_chunk)
+        sink.write(result_df)
+
+        total_rows += len(result_df)
+        total_chunks += 1
+        for category, count in result_df["risk_category"].value_counts().items():
+            category_counts[category] = category_counts.get(category, 0) + int(count)
+
+    return {
+        "model_version": artifact.version,
+        "rows": total_rows,
+        "chunks": total_chunks,
+        "category_counts": category_counts,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream-score an applications file in fixed-size chunks")
+    parser.add_argument("input_path", help="Source .csv, .parquet or .arrow file")
+    parser.add_argument("output_path", help="Destination .csv, .ndjson or .jsonl file")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--model-version", default=None)
+    parser.add_argument("--all-columns", action="store_true",
+                        help="Read and write every input column instead of only IDs, names and model features")
+    args = parser.parse_args()
+
+    artifact = get_registry().get(args.model_version)
+    columns = None if args.all_columns else scoring_columns(artifact.feature_columns)
+    with sink_for_path(args.output_path) as sink:
+        summary = score_stream(artifact, args.input_path, sink, args.chunksize, columns=columns)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import os
+import json
+import argparse
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .loan_application import DetailedProcessor
+from .model_registry import get_registry
+from .artifact_cache import get_artifact_cache
+from .analysis_store import populate_session_analyses
+from .. import models
+from ..database import SessionLocal, engine
+
+# Reports built at once by a bulk run; charts additionally go through the render pool
+DEFAULT_BULK_WORKERS = int(os.getenv("BULK_REPORT_WORKERS", str(min(8, os.cpu_count() or 1))))
+
+MANIFEST_FILENAME = "manifest.json"
+
+
+def report_filename(application_id):
+    return f"report_{application_id}.pdf"
+
+
+def generate_session_reports(processor, application_ids=None, workers=DEFAULT_BULK_WORKERS, progress=None):
+    """
+    Reports for every application of a processor's session (or `application_ids`),
+    `workers` at a time. All of them share the processor's model, LIME explainer and
+    one batched SHAP computation; Gemini calls go through the explanation route's rate limiter.
+    Returns a manifest: one {application_id, status, file, report_key, error} per application.
+    """
+    application_ids = list(processor.encoded_df.index if application_ids is None else application_ids)
+    # One TreeSHAP pass for the whole session before the workers start
+    processor.session_explanations()
+
+    def build(application_id):
+        if application_id not in processor.encoded_df.index:
+            raise LookupError(f"Application {application_id} not found in {processor.session_key}")
+        _, report_key = processor.report_pdf(application_id)
+        return report_key
+
+    manifest = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bulk-report") as pool:
+        futures = {pool.submit(build, application_id): application_id for application_id in application_ids}
+        for future in as_completed(futures):
+            application_id = futures[future]
+            entry = {"application_id": application_id, "status": "succeeded", "file": report_filename(application_id),
+                     "report_key": None, "error": None}
+            try:
+                entry["report_key"] = future.result()
+            except Exception as e:
+                entry.update(status="failed", file=None, error=str(e))
+            manifest[application_id] = entry
+            if progress is not None:
+                progress(len(manifest), len(application_ids), entry)
+
+    return [manifest[application_id] for application_id in application_ids]
+
+
+def write_reports_zip(manifest, fileobj, model_version=None):
+    """
+    Write the PDFs of a manifest's finished reports, plus the manifest itself, into a
+    ZIP archive on `fileobj`. Reports no longer in the artifact cache are marked missing.
+    """
+    cache = get_artifact_cache()
+    manifest = [dict(entry) for entry in manifest]
+    with zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for entry in manifest:
+            if entry["status"] != "succeeded":
+                continue
+            report_path = cache.get(entry["report_key"], ".pdf")
+            if report_path is None:
+                entry.update(status="missing", file=None, error="Report was evicted from the artifact cache")
+                continue
+            archive.write(report_path, entry["file"])
+        archive.writestr(MANIFEST_FILENAME, json.dumps({"model_version": model_version, "reports": manifest}, indent=2))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the report of every application in an applications file")
+    parser.add_argument("csv_path", nargs="?", default="backend/sample_data/apps_synthetic_data_200.csv")
+    parser.add_argument("--output", default="outdir/session_reports.zip", help="ZIP file with the PDFs and manifest.json")
+    parser.add_argument("--workers", type=int, default=DEFAULT_BULK_WORKERS)
+    parser.add_argument("--model-version", default=None)
+    parser.add_argument("--ids", nargs="*", default=None, help="Only these application IDs")
+    args = parser.parse_args()
+
+    processor = DetailedProcessor(args.csv_path, artifact=get_registry().get(args.model_version))
+
+    def progress(done, total, entry):
+        print(f"  [{done}/{total}] {entry['application_id']}: {entry['status']}"
+              + (f" ({entry['error']})" if entry["error"] else ""))
+
+    manifest = generate_session_reports(processor, args.ids, args.workers, progress)
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "wb") as f:
+        manifest = write_reports_zip(manifest, f, processor.artifact.version)
+
+    # Write the analyses of the reported applications through to the /analysis store
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        stored = populate_session_analyses(db, processor, [entry["application_id"] for entry in manifest
+                                                           if entry["status"] == "succeeded"])
+    finally:
+        db.close()
+    print(f"Stored {stored} new analyses")
+
+    succeeded = sum(entry["status"] == "succeeded" for entry in manifest)
+    print(f"{succeeded}/{len(manifest)} reports written to {args.output} (model {processor.artifact.version})")
+
+
+if __name__ == "__main__":
+    main()
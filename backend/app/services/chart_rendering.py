@@ -0,0 +1,147 @@
+import os
+import json
+import hashlib
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from .artifact_cache import get_artifact_cache
+
+# Threads that draw charts; each keeps one reusable Agg figure
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))
+# Bump when a drawing function changes so existing PNGs are redrawn
+RENDER_VERSION = 1
+# PNG text chunk holding the hash of the inputs a chart was drawn from
+RENDER_KEY_FIELD = "RenderKey"
+
+
+def draw_lime_bars(fig, feature_labels, weights, class_name, title):
+    """LIME's as_pyplot_figure chart: one bar per feature, green if it supports the class"""
+    ax = fig.add_subplot()
+    weights = list(reversed(weights))
+    positions = np.arange(len(weights)) + .5
+    ax.barh(positions, weights, align='center', color=['green' if w > 0 else 'red' for w in weights])
+    ax.set_yticks(positions, list(reversed(feature_labels)))
+    ax.set_title(f"Local explanation for class {class_name}")
+    fig.suptitle(title, fontsize=14, y=1.02)
+
+
+def draw_shap_bars(fig, shap_values, feature_names, title):
+    """SHAP values of one application, largest magnitude on top; red pushes towards the class"""
+    order = np.argsort(np.abs(shap_values))
+    values = np.asarray(shap_values)[order]
+    ax = fig.add_subplot()
+    ax.barh(np.arange(len(values)), values, color=['#ff0051' if v > 0 else '#008bfb' for v in values])
+    ax.set_yticks(np.arange(len(values)), [feature_names[i] for i in order])
+    ax.axvline(x=0, color='#999999', linewidth=0.8)
+    ax.set_xlabel("SHAP value (impact on model output)")
+    ax.set_title(title, fontsize=14, pad=20)
+
+
+def draw_five_c_bars(fig, aggregated_scores, predicted_category):
+    """5C scores from generate_aggregated_lime, most negative at the bottom"""
+    sorted_scores = sorted(aggregated_scores.items(), key=lambda item: item[1])
+    scores = [score for _, score in sorted_scores]
+    ax = fig.add_subplot()
+    ax.barh([category for category, _ in sorted_scores], scores, color=['red' if s < 0 else 'green' for s in scores])
+    ax.set_xlabel('Negative Impact <--- | ---> Positive Impact')
+    ax.set_title(f'Key Factors for Your "{predicted_category}" Rating')
+    ax.axvline(x=0, color='grey', linestyle='--')
+
+
+CHARTS = {
+    "lime": (draw_lime_bars, (6.4, 4.8)),
+    "shap": (draw_shap_bars, None),
+    "five_c": (draw_five_c_bars, (10, 7)),
+}
+
+
+def render_key(chart, data):
+    """Hash of a chart's kind and inputs; equal keys draw identical PNGs"""
+    payload = json.dumps([chart, RENDER_VERSION, data], sort_keys=True, default=lambda value: np.asarray(value).tolist())
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def stored_render_key(path):
+    """The render key written into an existing PNG, or None"""
+    from PIL import Image
+
+    try:
+        with Image.open(path) as image:
+            return image.text.get(RENDER_KEY_FIELD)
+    except (OSError, AttributeError):
+        return None
+
+
+class RenderPool:
+    """
+    Draws charts on dedicated worker threads with matplotlib's object-oriented Agg API,
+    so no pyplot state is shared and request handlers only wait on a future. Each worker
+    reuses one Figure. Charts are stored in the artifact cache by render key, so a chart
+    with unchanged inputs is never redrawn.
+    """
+
+    def __init__(self, workers=RENDER_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render")
+        self._local = threading.local()
+
+    def _figure(self):
+        fig = getattr(self._local, "figure", None)
+        if fig is None:
+            fig = self._local.figure = Figure()
+            FigureCanvasAgg(fig)
+        return fig
+
+    def _draw(self, chart, data, key, path):
+        draw, figsize = CHARTS[chart]
+        fig = self._figure()
+        fig.clear()
+        if figsize is None:  # one row per feature, as shap.bar_plot sizes its figure
+            figsize = (8, max(4, len(data["feature_names"]) * 0.3))
+        fig.set_size_inches(figsize)
+        try:
+            draw(fig, **data)
+            fig.savefig(path, format="png", bbox_inches="tight", metadata={RENDER_KEY_FIELD: key})
+        finally:
+            fig.clear()
+        print(f"{chart} chart drawn ({key[:12]})")
+
+    def _render(self, chart, path, data, key):
+        if path is not None and os.path.exists(path) and stored_render_key(path) == key:
+            return path
+        # Charts live in the artifact cache under their render key; `path` gets a copy
+        cached_path = get_artifact_cache().get_or_create(
+            key, ".png", lambda tmp_path: self._draw(chart, data, key, tmp_path))
+        if path is None:
+            return cached_path
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Copied aside and moved into place so readers never see a partial PNG
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        shutil.copyfile(cached_path, tmp_path)
+        os.replace(tmp_path, path)
+        print(f"{chart} chart saved to {path}")
+        return path
+
+    def submit(self, chart, path=None, **data):
+        """
+        Queue a chart (a CHARTS key); returns a Future of its path. The chart is written
+        to `path` if given, otherwise the artifact cache's copy is returned.
+        """
+        return self._executor.submit(self._render, chart, path, data, render_key(chart, data))
+
+    def render(self, chart, path=None, **data):
+        """Draw a chart and wait for it"""
+        return self.submit(chart, path, **data).result()
+
+
+# Worker threads are only started by the first submitted chart
+render_pool = RenderPool()
+
+
+def get_render_pool():
+    return render_pool
@@ -0,0 +1,197 @@
+import os
+import glob
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# Supported application file formats, picked by extension
+CSV_EXTENSIONS = ('.csv',)
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+ARROW_EXTENSIONS = ('.arrow', '.feather', '.ipc')
+
+ID_COLUMNS = ['application_id', 'first_name', 'middle_name', 'last_name']
+
+STRING_COLUMNS = [
+    'application_id', 'application_date', 'first_name', 'middle_name', 'last_name', 'email_address',
+    'civil_status', 'address_city', 'address_province', 'residence_type', 'employment_type',
+    'source_of_funds', 'postpaid_plan_history', 'data_usage_patterns', 'loan_purpose'
+]
+INTEGER_COLUMNS = [
+    'contact_number', 'dependents', 'years_of_stay', 'bpi_frequency_of_transactions', 'bpi_loans_taken',
+    'bpi_successful_loans', 'prepaid_load_frequency', 'gcash_frequency_of_transactions', 'loan_tenor_months'
+]
+FLOAT_COLUMNS = [
+    'credit_limit', 'gross_monthly_income', 'bpi_avg_monthly_deposits', 'bpi_avg_monthly_withdrawals',
+    'bpi_emi_payment', 'gcash_avg_monthly_deposits', 'gcash_avg_monthly_withdrawals', 'loan_amount_requested_php'
+]
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError("Parquet/Arrow support requires pyarrow: pip install pyarrow") from e
+
+
+def application_schema():
+    """Typed Arrow schema for application files; integer columns are nullable"""
+    _require_pyarrow()
+    import pyarrow as pa
+
+    fields = (
+        [pa.field(col, pa.string()) for col in STRING_COLUMNS] +
+        [pa.field(col, pa.int64()) for col in INTEGER_COLUMNS] +
+        [pa.field(col, pa.float64()) for col in FLOAT_COLUMNS]
+    )
+    return pa.schema(fields)
+
+
+def scoring_columns(feature_columns):
+    """ID/name columns plus the model features; everything else can be skipped when reading"""
+    return ID_COLUMNS + [col for col in feature_columns if col not in ID_COLUMNS]
+
+
+def file_format(path):
+    path = str(path).lower()
+    if path.endswith(CSV_EXTENSIONS):
+        return 'csv'
+    if path.endswith(PARQUET_EXTENSIONS):
+        return 'parquet'
+    if path.endswith(ARROW_EXTENSIONS):
+        return 'arrow'
+    raise ValueError(f"Unsupported application file format: {path}")
+
+
+def _present_columns(available, columns):
+    if columns is None:
+        return None
+    return [col for col in columns if col in set(available)]
+
+
+def _arrow_to_pandas(table):
+    # Nullable Arrow integers become floats with NaN, matching what read_csv infers
+    return table.to_pandas()
+
+
+def read_applications(path, columns=None):
+    """
+    Read an applications file (CSV, Parquet or Arrow IPC/Feather) into a DataFrame.
+    `columns` projects the read to just those columns; missing ones are ignored.
+    """
+    fmt = file_format(path)
+
+    if fmt == 'csv':
+        usecols = None if columns is None else (lambda col: col in set(columns))
+        return pd.read_csv(path, usecols=usecols)
+
+    _require_pyarrow()
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        schema_names = pq.read_schema(path).names
+        return _arrow_to_pandas(pq.read_table(path, columns=_present_columns(schema_names, columns)))
+
+    import pyarrow.feather as feather
+    table = feather.read_table(path, memory_map=True)
+    if columns is not None:
+        table = table.select(_present_columns(table.column_names, columns))
+    return _arrow_to_pandas(table)
+
+
+def iter_applications(path, chunksize, columns=None):
+    """Yield an applications file as DataFrames of at most `chunksize` rows"""
+    fmt = file_format(path)
+
+    if fmt == 'csv':
+        usecols = None if columns is None else (lambda col: col in set(columns))
+        yield from pd.read_csv(path, chunksize=chunksize, usecols=usecols)
+        return
+
+    _require_pyarrow()
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(path)
+        selected = _present_columns(parquet_file.schema_arrow.names, columns)
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=selected):
+            yield _arrow_to_pandas(batch)
+        return
+
+    # Memory-mapped, so only the batch being converted is materialized
+    import pyarrow.feather as feather
+    table = feather.read_table(path, memory_map=True)
+    if columns is not None:
+        table = table.select(_present_columns(table.column_names, columns))
+    for batch in table.to_batches(max_chunksize=chunksize):
+        yield _arrow_to_pandas(batch)
+
+
+def convert_applications_file(csv_path, out_path=None, fmt='parquet'):
+    """Convert an applications CSV to Parquet or Arrow IPC using the typed application schema"""
+    _require_pyarrow()
+    import pyarrow as pa
+
+    # Parse with pandas so missing values ("", "NA", "None", ...) are the same as in a CSV read
+    df = pd.read_csv(csv_path)
+    typed_fields = {field.name: field for field in application_schema()}
+    inferred = pa.Schema.from_pandas(df, preserve_index=False)
+    schema = pa.schema([typed_fields.get(field.name, field) for field in inferred])
+    table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+    if out_path is None:
+        out_path = os.path.splitext(csv_path)[0] + ('.parquet' if fmt == 'parquet' else '.arrow')
+
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(table, out_path, compression='zstd')
+    elif fmt == 'arrow':
+        import pyarrow.feather as feather
+        feather.write_feather(table, out_path, compression='uncompressed')
+    else:
+        raise ValueError(f"Unknown columnar format: {fmt}")
+
+    print(f"Converted {csv_path} ({table.num_rows} rows) to {out_path}")
+    return out_path
+
+
+def check_converted_file(csv_path, converted_path, artifact=None):
+    """
+    Score a CSV and its columnar copy with the same model artifact (default: the active
+    one) and raise ValueError unless the encoded features and probabilities are identical.
+    """
+    from .model_registry import get_registry
+    from .loan_screening import predict_loan_applications
+
+    artifact = artifact or get_registry().get()
+    csv_df = read_applications(csv_path)
+    converted_df = read_applications(converted_path)
+    csv_encoded = artifact.transform.transform(csv_df)
+    converted_encoded = artifact.transform.transform(converted_df)
+    try:
+        pd.testing.assert_frame_equal(csv_encoded, converted_encoded, check_dtype=False)
+    except AssertionError as e:
+        raise ValueError(f"{converted_path} encodes differently from {csv_path}: {e}") from e
+
+    _, csv_probabilities = predict_loan_applications(artifact.model, csv_encoded)
+    _, converted_probabilities = predict_loan_applications(artifact.model, converted_encoded)
+    if not np.array_equal(csv_probabilities, converted_probabilities):
+        raise ValueError(f"{converted_path} scores differently from {csv_path}")
+    print(f"Checked {converted_path}: {len(csv_df)} rows encode and score identically to {csv_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert application CSVs to columnar Parquet/Arrow files")
+    parser.add_argument("paths", nargs="*", default=glob.glob("backend/sample_data/*.csv"),
+                        help="CSV files to convert (default: every CSV in backend/sample_data)")
+    parser.add_argument("--format", choices=["parquet", "arrow"], default="parquet")
+    parser.add_argument("--skip-check", action="store_true",
+                        help="Do not check that each converted file scores identically to its CSV")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        out_path = convert_applications_file(path, fmt=args.format)
+        if not args.skip_check:
+            check_converted_file(path, out_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
-import google.generativeai as genai
+import io
 import os
+import hashlib
 
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
 from reportlab.lib.pagesizes import A4
@@ -12,19 +13,16 @@ from bs4 import BeautifulSoup
 
 from dotenv import load_dotenv
 
+from .llm_client import get_llm_client
+from .llm_providers import get_model
+
 load_dotenv()
 
 PAGE_WIDTH, PAGE_HEIGHT = A4
 MARGIN = 50  
 
-# Configure the API key
-genai.configure(api_key=os.getenv("GEMINI_API_KEY")) 
-
-# Create the model
-model = genai.GenerativeModel('gemini-1.5-flash')
-
-# Create the model
-model = genai.GenerativeModel('gemini-1.5-flash')
+# Model of the configured LLM provider that writes explanations and reports
+MODEL_NAME = 'gemini-1.5-flash'
 
 RISK_CATEGORY_MAP = {
     0: "Pass", 1: "Especially Mentioned", 2: "Substandard",
@@ -32,7 +30,8 @@ RISK_CATEGORY_MAP = {
 }
 
 def explain_ai(gen_type, df, application_id, lime_explanation, aggregated_lime_scores, X_train, probabilities, lime_image_path=None, 
-               outdir='outdir', additional_instructions=None): 
+               outdir='outdir', additional_instructions=None, aggregatedlime_image_path=None, shap_image_path=None,
+               report_path=None): 
     
     if gen_type == 'lengthy_summary': 
         prompt = generate_explanation_prompt(df, application_id=application_id, 
@@ -40,39 +39,59 @@ def explain_ai(gen_type, df, application_id, lime_explanation, aggregated_lime_s
                                              aggregated_lime_scores=aggregated_lime_scores, 
                                              X_train=X_train,
                                              additional_instructions=additional_instructions) 
-        response = model.generate_content(prompt)
-        return response.text
+        return generate_text(prompt)
     
     elif gen_type == 'full_report': 
-        lime_image_path=f'outdir/lime_explanation_{application_id}.png',
-        aggregatedlime_image_path=f'outdir/lime_aggregated_plot_{application_id}.png',
-        shap_image_path=f'outdir/shap_explanation_{application_id}.png'
-        prompt = generate_full_report_prompt(df, 
-                                             application_id=application_id, 
-                                             lime_explanation=lime_explanation,
-                                             aggregated_lime_scores=aggregated_lime_scores, 
-                                             probabilities=probabilities,
-                                             lime_image_path=lime_image_path,
-                                             aggregatedlime_image_path=aggregatedlime_image_path,
-                                             shap_image_path=shap_image_path,
-                                             additional_instructions=additional_instructions)
+        lime_image_path = lime_image_path or f'outdir/lime_explanation_{application_id}.png'
+        aggregatedlime_image_path = aggregatedlime_image_path or f'outdir/lime_aggregated_plot_{application_id}.png'
+        shap_image_path = shap_image_path or f'outdir/shap_explanation_{application_id}.png'
+        text = generate_full_report_text(df, application_id, lime_explanation, aggregated_lime_scores, probabilities,
+                                         lime_image_path, aggregatedlime_image_path, shap_image_path,
+                                         additional_instructions=additional_instructions)
 
-        response = model.generate_content(prompt)
         os.makedirs(outdir, exist_ok=True)
-        filename = os.path.join(outdir, f"report_{application_id}.pdf")
+        filename = report_path or os.path.join(outdir, f"report_{application_id}.pdf")
         extra_images = [
             path for path in [lime_image_path, aggregatedlime_image_path, shap_image_path] 
             if path
         ]
-        generate_pdf_from_text(response.text, filename=filename, extra_images=extra_images)
+        generate_pdf_from_text(text, filename=filename, extra_images=extra_images)
         
-        return response.text
+        return text
     
     elif gen_type == 'summary': 
         prompt = generate_summary_prompt(df, application_id, lime_explanation, aggregated_lime_scores, X_train,
                                         additional_instructions=additional_instructions) 
-        response = model.generate_content(prompt) 
-        return response.text
+        return generate_text(prompt)
+
+
+def generate_full_report_text(df, application_id, lime_explanation, aggregated_lime_scores, probabilities,
+                              lime_image_path, aggregatedlime_image_path, shap_image_path, additional_instructions=''):
+    """Markdown text of the full report, as written by the model for generate_full_report_prompt"""
+    prompt = generate_full_report_prompt(df, 
+                                         application_id=application_id, 
+                                         lime_explanation=lime_explanation,
+                                         aggregated_lime_scores=aggregated_lime_scores, 
+                                         probabilities=probabilities,
+                                         lime_image_path=lime_image_path,
+                                         aggregatedlime_image_path=aggregatedlime_image_path,
+                                         shap_image_path=shap_image_path,
+                                         additional_instructions=additional_instructions)
+    return generate_text(prompt)
+
+
+def generate_text(prompt):
+    """
+    Gemini's response to a prompt, through the shared LLM client's concurrency limits and
+    retries; identical prompts within the cache TTL are answered from the LLM response cache
+    """
+    return get_llm_client().generate(get_model(MODEL_NAME), prompt, route="explanation", cache=True)
+
+
+def full_report_template_key():
+    """Fingerprint of the full report prompt template; it changes whenever generate_full_report_prompt is edited"""
+    code = generate_full_report_prompt.__code__
+    return hashlib.sha256(repr((code.co_code, code.co_consts)).encode()).hexdigest()
 
 
 def generate_explanation_prompt(df, application_id, lime_explanation, aggregated_lime_scores, X_train, 
@@ -287,6 +306,7 @@ Aggregated 5C Contributions: {', '.join(c_summary)}
 
 Summarize the findings in clear, brief terms, highlighting the main positive and negative factors influencing the rating. {additional_instructions}
 """
+    return prompt
 
 import os
 import markdown
@@ -303,6 +323,7 @@ def generate_pdf_from_text(markdown_text, filename="report.pdf", extra_images=No
     """
     Convert Markdown text into a styled PDF with inline images, headings, lists, tables, and proper formatting.
     Supports tuple-style image paths and avoids duplicate insertions of the same image.
+    `filename` may also be a writable binary buffer (see render_pdf_bytes).
     """
     # Convert Markdown → HTML
     html = markdown.markdown(markdown_text, extensions=["tables"])
@@ -497,6 +518,14 @@ def generate_pdf_from_text(markdown_text, filename="report.pdf", extra_images=No
     # Build PDF
     if story:  # Only build if there's content
         doc.build(story)
-        print(f"✅ PDF generated: {filename}")
+        if isinstance(filename, str):
+            print(f"✅ PDF generated: {filename}")
     else:
-        print("⚠️ No content found to generate PDF")
\ No newline at end of file
+        print("⚠️ No content found to generate PDF")
+
+
+def render_pdf_bytes(markdown_text, extra_images=None):
+    """The PDF of generate_pdf_from_text, built in memory"""
+    buffer = io.BytesIO()
+    generate_pdf_from_text(markdown_text, filename=buffer, extra_images=extra_images)
+    return buffer.getvalue()
@@ -0,0 +1,138 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Kinds of per-feature weight kept in ExplanationRecords
+LIME, SHAP, FIVE_C = 0, 1, 2
+KIND_NAMES = {LIME: "lime", SHAP: "shap", FIVE_C: "5c"}
+
+
+class ExplanationRecords:
+    """
+    Long-format explanation weights: one (application, feature, class, kind, weight)
+    record per value, held in NumPy arrays.
+
+    Replaces the old `<feature>_LIMEimportance_for_<category>` style columns that were
+    added to the applicant DataFrame: the applicant data is never touched, the
+    structure grows by rows instead of columns, and lookups are vectorized masks.
+    Application IDs and feature names are stored as integer codes into small vocabularies.
+    Each (kind, application, class) is recorded once; repeat adds are ignored.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._application_codes = {}
+        self._feature_codes = {}
+        self._recorded = set()
+        self._pending = []
+        self._arrays = self._empty_arrays()
+
+    @staticmethod
+    def _empty_arrays():
+        return {
+            "application": np.empty(0, dtype=np.int32),
+            "feature": np.empty(0, dtype=np.int32),
+            "class": np.empty(0, dtype=np.int8),
+            "kind": np.empty(0, dtype=np.int8),
+            "weight": np.empty(0, dtype=np.float64),
+        }
+
+    def _code(self, vocabulary, key):
+        code = vocabulary.get(key)
+        if code is None:
+            code = vocabulary[key] = len(vocabulary)
+        return code
+
+    def has(self, kind, application_id, class_index):
+        with self._lock:
+            return (kind, application_id, int(class_index)) in self._recorded
+
+    def add(self, kind, application_id, class_index, features, weights):
+        """
+        Record one explanation: parallel `features` (names) and `weights` for one
+        application and class. Returns False if that explanation was already recorded.
+        """
+        weights = np.asarray(weights, dtype=np.float64)
+        key = (kind, application_id, int(class_index))
+        with self._lock:
+            if key in self._recorded:
+                return False
+            self._recorded.add(key)
+            application = self._code(self._application_codes, application_id)
+            feature_codes = np.fromiter((self._code(self._feature_codes, f) for f in features),
+                                        dtype=np.int32, count=len(weights))
+            self._pending.append({
+                "application": np.full(len(weights), application, dtype=np.int32),
+                "feature": feature_codes,
+                "class": np.full(len(weights), class_index, dtype=np.int8),
+                "kind": np.full(len(weights), kind, dtype=np.int8),
+                "weight": weights,
+            })
+        return True
+
+    def _consolidated(self):
+        # Appends are batched and concatenated once, on the next read
+        with self._lock:
+            if self._pending:
+                chunks = [self._arrays] + self._pending
+                self._arrays = {key: np.concatenate([chunk[key] for chunk in chunks]) for key in self._arrays}
+                self._pending = []
+            return self._arrays, dict(self._application_codes), dict(self._feature_codes)
+
+    def __len__(self):
+        return len(self._consolidated()[0]["weight"])
+
+    def _mask(self, arrays, application_codes, kind=None, application_id=None, class_index=None):
+        mask = np.ones(len(arrays["weight"]), dtype=bool)
+        if kind is not None:
+            mask &= arrays["kind"] == kind
+        if application_id is not None:
+            code = application_codes.get(application_id)
+            if code is None:
+                return np.zeros_like(mask)
+            mask &= arrays["application"] == code
+        if class_index is not None:
+            mask &= arrays["class"] == class_index
+        return mask
+
+    def weights(self, kind, application_id, class_index=None):
+        """{feature: weight} for one application (and class); later records win"""
+        arrays, application_codes, feature_codes = self._consolidated()
+        mask = self._mask(arrays, application_codes, kind, application_id, class_index)
+        feature_names = np.array(list(feature_codes), dtype=object)
+        return dict(zip(feature_names[arrays["feature"][mask]], arrays["weight"][mask].tolist()))
+
+    def top(self, kind, application_id, class_index=None, n=5):
+        """The `n` (feature, weight) records of one application (and class) with the largest |weight|"""
+        arrays, application_codes, feature_codes = self._consolidated()
+        mask = self._mask(arrays, application_codes, kind, application_id, class_index)
+        features, weights = arrays["feature"][mask], arrays["weight"][mask]
+        order = np.argsort(-np.abs(weights), kind="stable")[:n]
+        feature_names = np.array(list(feature_codes), dtype=object)
+        return list(zip(feature_names[features[order]].tolist(), weights[order].tolist()))
+
+    def matrix(self, kind, class_index=None):
+        """
+        Wide (applications x features) DataFrame of one kind of weight, built with a
+        single vectorized scatter; missing entries are NaN.
+        """
+        arrays, application_codes, feature_codes = self._consolidated()
+        mask = self._mask(arrays, application_codes, kind, class_index=class_index)
+        values = np.full((len(application_codes), len(feature_codes)), np.nan)
+        values[arrays["application"][mask], arrays["feature"][mask]] = arrays["weight"][mask]
+
+        applications = pd.Index(list(application_codes), name="application_id")
+        matrix = pd.DataFrame(values, index=applications, columns=list(feature_codes))
+        return matrix.dropna(how="all").dropna(axis=1, how="all")
+
+    def to_frame(self):
+        """All records as a long DataFrame: application_id, feature, class, kind, weight"""
+        arrays, application_codes, feature_codes = self._consolidated()
+        return pd.DataFrame({
+            "application_id": np.array(list(application_codes), dtype=object)[arrays["application"]],
+            "feature": np.array(list(feature_codes), dtype=object)[arrays["feature"]],
+            "class": arrays["class"],
+            "kind": pd.Categorical.from_codes(arrays["kind"], categories=list(KIND_NAMES.values())),
+            "weight": arrays["weight"],
+        })
@@ -0,0 +1,119 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .loan_screening import categorical_codes
+
+# Sessions kept in memory per worker; the oldest is dropped first
+MAX_STORED_SESSIONS = 16
+
+
+class SessionExplanations:
+    """
+    TreeSHAP values for every application of one session under one model version,
+    computed in a single batched call. shap_values has shape (applications, features, classes).
+    """
+
+    def __init__(self, session_key, model_version, application_ids, feature_names,
+                 predicted_classes, shap_values, expected_value):
+        self.session_key = session_key
+        self.model_version = model_version
+        self.application_ids = application_ids
+        self.feature_names = feature_names
+        self.predicted_classes = predicted_classes
+        self.shap_values = shap_values
+        self.expected_value = expected_value
+
+    def __contains__(self, application_id):
+        return application_id in self.application_ids
+
+    def for_application(self, application_id, class_index=None):
+        """
+        (shap values, expected value, class) for one application, for its predicted
+        class unless `class_index` is given. Raises KeyError for unknown applications.
+        """
+        position = self.application_ids.get_loc(application_id)
+        if class_index is None:
+            class_index = int(self.predicted_classes[position])
+        return self.shap_values[position, :, class_index], float(self.expected_value[class_index]), class_index
+
+
+def compute_session_explanations(artifact, session_key, encoded_df):
+    """Run the artifact's cached TreeExplainer once over every application of a session"""
+    X = categorical_codes(encoded_df[artifact.feature_columns]).to_numpy(dtype=float)
+    shap_values = np.asarray(artifact.shap_explainer.shap_values(X))
+    if shap_values.ndim == 3 and shap_values.shape[0] == len(artifact.model.classes_):
+        # Older shap releases return one (applications, features) array per class
+        shap_values = np.moveaxis(shap_values, 0, -1)
+
+    probabilities = artifact.model.predict_proba(encoded_df)
+    return SessionExplanations(
+        session_key=session_key,
+        model_version=artifact.version,
+        application_ids=encoded_df.index,
+        feature_names=list(artifact.feature_columns),
+        predicted_classes=artifact.model.classes_[probabilities.argmax(axis=1)],
+        shap_values=shap_values.astype(np.float32),
+        expected_value=np.atleast_1d(artifact.shap_explainer.expected_value).astype(float),
+    )
+
+
+class ExplanationStore:
+    """
+    Process-wide store of per-session explanations keyed by (session, model version),
+    so the per-application API and report paths look SHAP values up instead of
+    recomputing them. A session is computed once even if requests arrive concurrently.
+    """
+
+    def __init__(self, max_sessions=MAX_STORED_SESSIONS):
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+        self._session_locks = {}
+
+    def get(self, session_key, model_version):
+        with self._lock:
+            explanations = self._sessions.get((session_key, model_version))
+            if explanations is not None:
+                self._sessions.move_to_end((session_key, model_version))
+            return explanations
+
+    def put(self, explanations):
+        key = (explanations.session_key, explanations.model_version)
+        with self._lock:
+            self._sessions[key] = explanations
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def get_or_compute(self, artifact, session_key, encoded_df):
+        """Stored explanations for the session, computing them for all its applications on a miss"""
+        explanations = self.get(session_key, artifact.version)
+        if explanations is not None:
+            return explanations
+
+        key = (session_key, artifact.version)
+        with self._lock:
+            session_lock = self._session_locks.setdefault(key, threading.Lock())
+        with session_lock:
+            explanations = self.get(session_key, artifact.version)
+            if explanations is None:
+                explanations = compute_session_explanations(artifact, session_key, encoded_df)
+                self.put(explanations)
+        with self._lock:
+            self._session_locks.pop(key, None)
+        return explanations
+
+    def invalidate(self, session_key):
+        """Drop a session's explanations for every model version"""
+        with self._lock:
+            for key in [key for key in self._sessions if key[0] == session_key]:
+                del self._sessions[key]
+
+
+explanation_store = ExplanationStore()
+
+
+def get_explanation_store():
+    return explanation_store
@@ -0,0 +1,225 @@
+import time
+import argparse
+
+import numpy as np
+
+from .loan_screening import categorical_codes, RISK_CATEGORY_NAMES
+
+# LightGBM treats |x| <= kZeroThreshold as zero for missing_type == Zero
+ZERO_THRESHOLD = 1e-35
+
+MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+MISSING_TYPES = {'None': MISSING_NONE, 'Zero': MISSING_ZERO, 'NaN': MISSING_NAN}
+
+
+class CompiledForest:
+    """
+    A trained multiclass LightGBM model flattened into NumPy arrays.
+
+    Internal nodes live in one set of parallel arrays, numerical splits first, then
+    categorical splits, followed by the leaves. For one application every split
+    decision is evaluated in a single vectorized pass, which yields a "next node" table
+    (leaves point at themselves); all trees are then walked together by indexing that
+    table `max_depth` times. Inputs are the numeric feature view (categorical_codes)
+    in `feature_names` order.
+    """
+
+    def __init__(self, booster):
+        dump = booster.dump_model()
+        self.feature_names = list(dump['feature_names'])
+        self.num_class = dump['num_tree_per_iteration']
+
+        internal, leaves, roots = [], [], []
+
+        def add_node(node, class_index, depth):
+            if 'leaf_value' in node:
+                leaves.append((node['leaf_value'], class_index))
+                return ('leaf', len(leaves) - 1), depth
+
+            index = len(internal)
+            internal.append(None)
+            left, left_depth = add_node(node['left_child'], class_index, depth + 1)
+            right, right_depth = add_node(node['right_child'], class_index, depth + 1)
+            internal[index] = (node, left, right)
+            return ('node', index), max(left_depth, right_depth)
+
+        max_depth = 0
+        for tree in dump['tree_info']:
+            root, depth = add_node(tree['tree_structure'], tree['tree_index'] % self.num_class, 0)
+            roots.append(root)
+            max_depth = max(max_depth, depth)
+
+        # Renumber internal nodes so numerical and categorical splits form two contiguous blocks
+        order = sorted(range(len(internal)), key=lambda index: internal[index][0]['decision_type'] == '==')
+        new_index = {old: new for new, old in enumerate(order)}
+        n_internal = len(internal)
+
+        def unified(ref):
+            kind, index = ref
+            return new_index[index] if kind == 'node' else n_internal + index
+
+        split_feature, threshold, is_categorical, default_left, missing_type = [], [], [], [], []
+        left_child, right_child, category_sets = [], [], []
+        for old in order:
+            node, left, right = internal[old]
+            split_feature.append(node['split_feature'])
+            default_left.append(node['default_left'])
+            missing_type.append(MISSING_TYPES[node['missing_type']])
+            if node['decision_type'] == '==':
+                # Categorical split: the threshold lists the category codes that go left
+                is_categorical.append(True)
+                threshold.append(len(category_sets))
+                category_sets.append([int(c) for c in str(node['threshold']).split('||')])
+            else:
+                is_categorical.append(False)
+                threshold.append(node['threshold'])
+            left_child.append(unified(left))
+            right_child.append(unified(right))
+
+        self.max_depth = max_depth
+        self.roots = np.array([unified(root) for root in roots], dtype=np.int64)
+        self.split_feature = np.array(split_feature, dtype=np.int64)
+        self.threshold = np.array(threshold, dtype=np.float64)
+        self.default_left = np.array(default_left, dtype=bool)
+        self.missing_type = np.array(missing_type, dtype=np.int8)
+        self.left_child = np.array(left_child, dtype=np.int64)
+        self.right_child = np.array(right_child, dtype=np.int64)
+        self.leaf_value = np.array([value for value, _ in leaves], dtype=np.float64)
+        self.leaf_class = np.array([class_index for _, class_index in leaves], dtype=np.int64)
+        # Next-node table = right children + go_left * (left - right); leaves are absorbing states
+        self.next_right = np.concatenate([self.right_child, np.arange(n_internal, n_internal + len(leaves))])
+        self.left_offset = self.left_child - self.right_child
+
+        self.n_numeric = n_internal - int(sum(is_categorical))
+        self.numeric_feature = self.split_feature[:self.n_numeric]
+        self.numeric_threshold = self.threshold[:self.n_numeric]
+        # Splits whose missing-value handling overrides the plain threshold comparison
+        self.missing_nodes = np.flatnonzero(self.missing_type[:self.n_numeric] != MISSING_NONE)
+
+        # Categorical block: membership as a dense table, row = split, column = category code
+        width = max((max(cats) for cats in category_sets), default=-1) + 1
+        self.category_table = np.zeros((len(category_sets), max(width, 1)), dtype=bool)
+        for row, cats in enumerate(category_sets):
+            self.category_table[row, cats] = True
+
+    @classmethod
+    def from_model(cls, model):
+        return cls(model.booster_)
+
+    def _go_left(self, x):
+        """LightGBM's NumericalDecision / CategoricalDecision for every internal node at once"""
+        go_left = np.empty(len(self.split_feature), dtype=bool)
+
+        # Numerical splits: NaN reads as zero, except where the split tracks NaN (fixed below)
+        x_filled = np.where(np.isnan(x), 0.0, x)
+        go_left[:self.n_numeric] = x_filled[self.numeric_feature] <= self.numeric_threshold
+
+        if self.missing_nodes.size:
+            nodes = self.missing_nodes
+            values = x[self.split_feature[nodes]]
+            is_nan = np.isnan(values)
+            missing_type = self.missing_type[nodes]
+            use_default = (
+                ((missing_type == MISSING_ZERO) & (np.abs(np.where(is_nan, 0.0, values)) <= ZERO_THRESHOLD)) |
+                ((missing_type == MISSING_NAN) & is_nan)
+            )
+            go_left[nodes] = np.where(use_default, self.default_left[nodes], go_left[nodes])
+
+        # Categorical splits: NaN goes right when NaN is tracked, otherwise reads as code 0;
+        # negative or out-of-table codes go right
+        values = x[self.split_feature[self.n_numeric:]]
+        is_nan = np.isnan(values)
+        codes = np.where(is_nan, 0.0, values).astype(np.int64)
+        in_table = (codes >= 0) & (codes < self.category_table.shape[1])
+        member = self.category_table[np.arange(len(codes)), np.where(in_table, codes, 0)] & in_table
+        go_left[self.n_numeric:] = member & ~(is_nan & (self.missing_type[self.n_numeric:] == MISSING_NAN))
+
+        return go_left
+
+    def raw_scores_row(self, feature_vector):
+        """Per-class raw scores for one numeric feature vector"""
+        go_left = self._go_left(feature_vector)
+        next_node = self.next_right.copy()
+        next_node[:len(go_left)] += self.left_offset * go_left
+
+        current = self.roots
+        for _ in range(self.max_depth):
+            current = next_node[current]
+
+        leaves = current - len(self.split_feature)
+        return np.bincount(self.leaf_class[leaves], weights=self.leaf_value[leaves], minlength=self.num_class)
+
+    def predict_row_proba(self, feature_vector):
+        scores = self.raw_scores_row(np.asarray(feature_vector, dtype=np.float64))
+        exp_scores = np.exp(scores - scores.max())
+        return exp_scores / exp_scores.sum()
+
+    def predict_row(self, feature_vector):
+        """Category name and class probabilities for one numeric feature vector"""
+        probabilities = self.predict_row_proba(feature_vector)
+        return RISK_CATEGORY_NAMES[int(probabilities.argmax())], probabilities
+
+    def predict_proba(self, X):
+        """Row-by-row probabilities for a 2-D float array of shape (n_rows, n_features)"""
+        return np.array([self.predict_row_proba(row) for row in np.asarray(X, dtype=np.float64)])
+
+
+def feature_matrix(encoded_df, feature_names):
+    """Numeric (n_rows, n_features) array for CompiledForest from a transformed feature frame"""
+    return categorical_codes(encoded_df[feature_names]).to_numpy(dtype=np.float64)
+
+
+def check_parity(forest, model, encoded_df, atol=1e-9):
+    """
+    Compare CompiledForest against LightGBM on a transformed feature frame.
+    Returns the max absolute probability difference and whether every predicted
+    category matches; raises AssertionError if either check fails.
+    """
+    expected = model.predict_proba(encoded_df)
+    actual = forest.predict_proba(feature_matrix(encoded_df, forest.feature_names))
+
+    max_abs_diff = float(np.abs(expected - actual).max())
+    categories_match = bool((expected.argmax(axis=1) == actual.argmax(axis=1)).all())
+    if max_abs_diff > atol or not categories_match:
+        raise AssertionError(
+            f"CompiledForest diverges from LightGBM: max |dp| = {max_abs_diff:.3g}, "
+            f"categories match = {categories_match}"
+        )
+    return {"rows": int(len(encoded_df)), "max_abs_diff": max_abs_diff, "categories_match": categories_match}
+
+
+def main():
+    # Imported here so the compiled engine itself does not depend on the registry
+    from .model_registry import get_registry
+    from .data_io import read_applications
+
+    parser = argparse.ArgumentParser(description="Check the compiled predictor against LightGBM and time single-row scoring")
+    parser.add_argument("csv_path", nargs="?", default="backend/sample_data/apps_synthetic_data_200.csv")
+    parser.add_argument("--model-version", default=None)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    artifact = get_registry().get(args.model_version)
+    forest = artifact.compiled
+    encoded_df = artifact.transform.transform(read_applications(args.csv_path))
+    print(check_parity(forest, artifact.model, encoded_df))
+
+    one_row_df = encoded_df.iloc[[0]]
+    one_row = feature_matrix(one_row_df, forest.feature_names)[0]
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        probabilities = artifact.model.predict_proba(one_row_df)[0]
+        artifact.model.classes_[probabilities.argmax()]
+    lightgbm_us = (time.perf_counter() - start) / args.repeat * 1e6
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        forest.predict_row(one_row)
+    compiled_us = (time.perf_counter() - start) / args.repeat * 1e6
+
+    print(f"Single row: LightGBM {lightgbm_us:.0f} us, compiled {compiled_us:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+from .loan_screening import non_features, RISK_WEIGHTS, as_category_labels
+
+
+class FeatureTransform:
+    """
+    Frozen raw-application -> model-feature mapping, fitted once on the training data.
+
+    Applies the same steps as load_and_preprocess_data (categorical typing, median fill,
+    min-max scaling of the weighted columns) but with the statistics captured at fit
+    time, so a single-row request and a large batch are transformed identically and
+    nothing global is mutated. Categorical columns come out as pandas `category` dtype
+    with the fixed training category lists, which LightGBM consumes as native categorical
+    features; values not seen during training become missing. Categoricals that feed the
+    risk index (RISK_WEIGHTS) keep their scaled integer codes, since the training labels
+    are computed from exactly those codes.
+    """
+
+    def __init__(self):
+        self.feature_columns = []
+        self.categories = {}
+        self.fill_values = {}
+        self.normalization_ranges = {}
+
+    @property
+    def categorical_columns(self):
+        """Columns handed to LightGBM as native categoricals"""
+        return [col for col in self.feature_columns if col in self.categories and col not in RISK_WEIGHTS]
+
+    def _encode(self, raw_df):
+        """Vectorized typing against the frozen category lists; unknown labels become NaN"""
+        columns = {}
+        for col in self.feature_columns:
+            if col in self.categories:
+                labels = as_category_labels(raw_df[col]) if col in raw_df.columns else [np.nan] * len(raw_df)
+                categorical = pd.Categorical(labels, categories=self.categories[col])
+                if col in RISK_WEIGHTS:
+                    codes = categorical.codes
+                    columns[col] = np.where(codes >= 0, codes, np.nan)
+                else:
+                    columns[col] = categorical
+            elif col in raw_df.columns:
+                columns[col] = pd.to_numeric(raw_df[col], errors="coerce").to_numpy(dtype=float)
+            else:
+                columns[col] = np.full(len(raw_df), np.nan)
+        return pd.DataFrame(columns, index=raw_df.index)
+
+    def fit(self, raw_df):
+        categorical_cols = raw_df.select_dtypes(include=['object', 'string']).columns
+        self.feature_columns = [col for col in raw_df.columns if col not in non_features]
+        self.categories = {
+            col: sorted(as_category_labels(raw_df[col]).unique())
+            for col in categorical_cols if col not in non_features
+        }
+
+        encoded = self._encode(raw_df)
+        numeric_cols = [col for col in self.feature_columns if col not in self.categorical_columns]
+        self.fill_values = encoded[numeric_cols].median().to_dict()
+        encoded = encoded.fillna(self.fill_values)
+        self.normalization_ranges = {
+            col: (float(encoded[col].min()), float(encoded[col].max()))
+            for col in RISK_WEIGHTS if col in numeric_cols
+        }
+        return self
+
+    def transform(self, raw_df):
+        """Turn raw application rows into the model's feature matrix, indexed by application_id"""
+        encoded = self._encode(raw_df).fillna(self.fill_values)
+        for col, (col_min, col_max) in self.normalization_ranges.items():
+            encoded[col] = (encoded[col] - col_min) / (col_max - col_min)
+
+        if 'application_id' in raw_df.columns:
+            encoded.index = pd.Index(raw_df['application_id'], name='application_id')
+        return encoded
+
+    def fit_transform(self, raw_df):
+        return self.fit(raw_df).transform(raw_df)
+
+    def describe(self):
+        return {
+            "feature_columns": list(self.feature_columns),
+            "categories": {col: len(cats) for col, cats in self.categories.items()},
+            "normalization_ranges": {col: list(bounds) for col, bounds in self.normalization_ranges.items()},
+        }
@@ -10,7 +10,7 @@ def process_csv_basic(test_csv_path: str, train_csv_path: str = "sample_data/app
     Process a CSV file and return loan application data with risk categories and probabilities.
     
     Args:
-        test_csv_path: Path to the CSV file containing loan applications to process
+        test_csv_path: Path to the CSV, Parquet or Arrow file containing loan applications to process
         train_csv_path: Path to the training data CSV file
     
     Returns:
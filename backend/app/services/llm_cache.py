@@ -0,0 +1,68 @@
+import os
+import json
+import time
+
+from .artifact_cache import ArtifactCache, content_key
+
+DEFAULT_LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", "outdir/llm_cache")
+DEFAULT_LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_MB", "64")) * 1024 * 1024
+# Cached responses older than this are generated again; 0 disables the cache
+DEFAULT_LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+def generation_settings(model):
+    """Model name and generation config of a GenerativeModel-like object, as cache key parts"""
+    model_name = getattr(model, "model_name", type(model).__name__)
+    config = getattr(model, "_generation_config", None) or {}
+    return model_name, dict(config) if isinstance(config, dict) else str(config)
+
+
+class LLMResponseCache:
+    """
+    On-disk cache of LLM responses keyed by model name, prompt hash and generation
+    settings. Entries expire after `ttl_seconds`; the store is an ArtifactCache, so it
+    is bounded in size and evicts the least recently used responses first.
+    """
+
+    def __init__(self, root=DEFAULT_LLM_CACHE_DIR, max_bytes=DEFAULT_LLM_CACHE_MAX_BYTES,
+                 ttl_seconds=DEFAULT_LLM_CACHE_TTL_SECONDS):
+        self.store = ArtifactCache(root, max_bytes)
+        self.ttl_seconds = ttl_seconds
+
+    def key(self, model_name, prompt, settings=None):
+        prompt_hash = content_key(prompt)
+        return content_key("llm_response", model_name, prompt_hash, settings)
+
+    def get(self, model_name, prompt, settings=None):
+        """Cached response text, or None if missing or expired"""
+        if self.ttl_seconds <= 0:
+            return None
+        path = self.store.get(self.key(model_name, prompt, settings), ".json")
+        if path is None:
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry["created_at"] > self.ttl_seconds:
+            return None
+        return entry["text"]
+
+    def put(self, model_name, prompt, text, settings=None):
+        if self.ttl_seconds <= 0:
+            return
+        key = self.key(model_name, prompt, settings)
+        entry = json.dumps({"created_at": time.time(), "model": model_name, "text": text})
+        path = self.store.path(key, ".json")
+        if os.path.exists(path):
+            # Refresh an expired entry in place
+            os.remove(path)
+        self.store.put_bytes(key, ".json", entry.encode("utf-8"))
+
+
+llm_response_cache = LLMResponseCache()
+
+
+def get_llm_response_cache():
+    return llm_response_cache
@@ -0,0 +1,256 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+
+from google.api_core import exceptions as google_exceptions
+
+from .llm_cache import get_llm_response_cache, generation_settings
+from .rate_limiting import RateLimiter, LLM_CALLS_PER_MINUTE
+
+# LLM calls in flight at once across all routes of an API process
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Per-route limits, e.g. "chatbot=4,explanation=2,ocr=4"; routes not listed only share the global limit
+LLM_ROUTE_CONCURRENCY = os.getenv("LLM_ROUTE_CONCURRENCY", "chatbot=4,explanation=2,ocr=4")
+# Per-route calls per minute, e.g. "explanation=30"; only routes listed here are rate limited,
+# so bulk report generation never holds back chatbot or OCR calls
+LLM_ROUTE_CALLS_PER_MINUTE = os.getenv("LLM_ROUTE_CALLS_PER_MINUTE", f"explanation={int(LLM_CALLS_PER_MINUTE)}")
+# Seconds a single model call may take
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+# Seconds a caller waits for a free concurrency slot before giving up
+LLM_SLOT_WAIT_SECONDS = float(os.getenv("LLM_SLOT_WAIT_SECONDS", "120"))
+# Retries of a rate-limited call, with full-jitter exponential backoff starting at LLM_BACKOFF_SECONDS
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_SECONDS = float(os.getenv("LLM_BACKOFF_SECONDS", "1"))
+LLM_MAX_BACKOFF_SECONDS = 30.0
+# Latencies kept per route for the percentiles in the metrics
+LATENCY_WINDOW = 1000
+
+RATE_LIMIT_ERRORS = (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)
+TIMEOUT_ERRORS = (google_exceptions.DeadlineExceeded, asyncio.TimeoutError, TimeoutError)
+
+
+def parse_route_limits(spec):
+    """{"chatbot": 4, ...} from "chatbot=4,..." """
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        route, _, limit = item.partition("=")
+        limits[route.strip()] = int(limit)
+    return limits
+
+
+def is_rate_limited(error):
+    return isinstance(error, RATE_LIMIT_ERRORS) or getattr(error, "code", None) == 429
+
+
+def token_usage(response):
+    """Prompt, output and total token counts from a response's usage metadata"""
+    usage = getattr(response, "usage_metadata", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+        "output_tokens": getattr(usage, "candidates_token_count", 0) or 0,
+        "total_tokens": getattr(usage, "total_token_count", 0) or 0,
+    }
+
+
+def _percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+
+class LLMMetrics:
+    """Thread-safe per-route call counts, token usage and latency of LLM calls"""
+
+    COUNTERS = ("calls", "cache_hits", "errors", "timeouts", "rate_limited", "retries",
+                "prompt_tokens", "output_tokens", "total_tokens")
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def _route(self, route):
+        stats = self._routes.get(route)
+        if stats is None:
+            stats = dict.fromkeys(self.COUNTERS, 0)
+            stats["in_flight"] = 0
+            stats["latencies"] = deque(maxlen=self.window)
+            self._routes[route] = stats
+        return stats
+
+    def add(self, route, **counts):
+        with self._lock:
+            stats = self._route(route)
+            for name, value in counts.items():
+                stats[name] += value
+
+    def record_latency(self, route, seconds):
+        with self._lock:
+            self._route(route)["latencies"].append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            routes = {}
+            for route, stats in self._routes.items():
+                latencies = sorted(stats["latencies"])
+                routes[route] = {name: value for name, value in stats.items() if name != "latencies"}
+                routes[route]["latency_ms"] = {
+                    "p50": _ms(_percentile(latencies, 0.5)),
+                    "p95": _ms(_percentile(latencies, 0.95)),
+                    "max": _ms(latencies[-1] if latencies else None),
+                    "mean": _ms(sum(latencies) / len(latencies) if latencies else None),
+                }
+        totals = {name: sum(stats[name] for stats in routes.values()) for name in self.COUNTERS + ("in_flight",)}
+        return {"routes": routes, "totals": totals}
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+class LLMClient:
+    """
+    Shared entry point for every Gemini call. Calls are limited by a global and a
+    per-route concurrency slot and, on routes that opt in, by a per-minute rate
+    limiter; they time out after `timeout` seconds and are retried with jittered
+    backoff when the API reports a rate limit. generate() serves worker threads;
+    endpoints await generate_async(), which never blocks the event loop. Plain-text
+    prompts can be answered from the LLM response cache.
+    """
+
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY, route_limits=None, timeout=LLM_TIMEOUT_SECONDS,
+                 slot_wait=LLM_SLOT_WAIT_SECONDS, max_retries=LLM_MAX_RETRIES, backoff_seconds=LLM_BACKOFF_SECONDS,
+                 route_rates=None):
+        self.timeout = timeout
+        self.slot_wait = slot_wait
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.metrics = LLMMetrics()
+        self._global_slots = threading.BoundedSemaphore(max_concurrency)
+        self._route_limits = parse_route_limits(LLM_ROUTE_CONCURRENCY) if route_limits is None else dict(route_limits)
+        self._route_slots = {route: threading.BoundedSemaphore(limit) for route, limit in self._route_limits.items()}
+        route_rates = parse_route_limits(LLM_ROUTE_CALLS_PER_MINUTE) if route_rates is None else route_rates
+        self._rate_limiters = {route: RateLimiter(rate) for route, rate in route_rates.items()}
+
+    def _slots(self, route):
+        slots = [self._global_slots]
+        if route in self._route_slots:
+            slots.insert(0, self._route_slots[route])
+        return slots
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff before retry number `attempt` (0-based)"""
+        return random.uniform(0, min(LLM_MAX_BACKOFF_SECONDS, self.backoff_seconds * 2 ** attempt))
+
+    def _cached(self, model, contents, cache):
+        """(cache key parts, cached text) for a cacheable prompt, else (None, None)"""
+        if not cache or not isinstance(contents, str):
+            return None, None
+        model_name, settings = generation_settings(model)
+        return (model_name, contents, settings), get_llm_response_cache().get(model_name, contents, settings)
+
+    def _record(self, route, started, response):
+        self.metrics.record_latency(route, time.monotonic() - started)
+        self.metrics.add(route, calls=1, **token_usage(response))
+
+    def _failed(self, route, error):
+        self.metrics.add(route, errors=1, timeouts=int(isinstance(error, TIMEOUT_ERRORS)))
+
+    def generate(self, model, contents, route="default", cache=False):
+        """Text of model.generate_content(contents), for code running in worker threads"""
+        cache_key, text = self._cached(model, contents, cache)
+        if text is not None:
+            self.metrics.add(route, cache_hits=1)
+            return text
+
+        acquired = []
+        try:
+            for slot in self._slots(route):
+                if not slot.acquire(timeout=self.slot_wait):
+                    raise TimeoutError(f"No free LLM slot for route '{route}' within {self.slot_wait}s")
+                acquired.append(slot)
+            self.metrics.add(route, in_flight=1)
+            try:
+                for attempt in range(self.max_retries + 1):
+                    if route in self._rate_limiters:
+                        self._rate_limiters[route].acquire()
+                    started = time.monotonic()
+                    try:
+                        response = model.generate_content(contents, request_options={"timeout": self.timeout})
+                        text = response.text
+                    except Exception as e:
+                        if is_rate_limited(e) and attempt < self.max_retries:
+                            self.metrics.add(route, rate_limited=1, retries=1)
+                            time.sleep(self.backoff(attempt))
+                            continue
+                        self._failed(route, e)
+                        raise
+                    self._record(route, started, response)
+                    break
+            finally:
+                self.metrics.add(route, in_flight=-1)
+        finally:
+            for slot in reversed(acquired):
+                slot.release()
+
+        if cache_key is not None:
+            get_llm_response_cache().put(cache_key[0], cache_key[1], text, cache_key[2])
+        return text
+
+    async def _acquire_async(self, slot, route):
+        # The slots are shared with worker threads, so they are polled rather than awaited
+        deadline = time.monotonic() + self.slot_wait
+        while not slot.acquire(blocking=False):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"No free LLM slot for route '{route}' within {self.slot_wait}s")
+            await asyncio.sleep(0.05)
+
+    async def generate_async(self, model, contents, route="default", cache=False):
+        """Text of model.generate_content_async(contents), awaited from endpoints"""
+        cache_key, text = self._cached(model, contents, cache)
+        if text is not None:
+            self.metrics.add(route, cache_hits=1)
+            return text
+
+        acquired = []
+        try:
+            for slot in self._slots(route):
+                await self._acquire_async(slot, route)
+                acquired.append(slot)
+            self.metrics.add(route, in_flight=1)
+            try:
+                for attempt in range(self.max_retries + 1):
+                    while route in self._rate_limiters and (wait := self._rate_limiters[route].try_acquire()) > 0:
+                        await asyncio.sleep(wait)
+                    started = time.monotonic()
+                    try:
+                        response = await asyncio.wait_for(
+                            model.generate_content_async(contents, request_options={"timeout": self.timeout}),
+                            self.timeout)
+                        text = response.text
+                    except Exception as e:
+                        if is_rate_limited(e) and attempt < self.max_retries:
+                            self.metrics.add(route, rate_limited=1, retries=1)
+                            await asyncio.sleep(self.backoff(attempt))
+                            continue
+                        self._failed(route, e)
+                        raise
+                    self._record(route, started, response)
+                    break
+            finally:
+                self.metrics.add(route, in_flight=-1)
+        finally:
+            for slot in reversed(acquired):
+                slot.release()
+
+        if cache_key is not None:
+            get_llm_response_cache().put(cache_key[0], cache_key[1], text, cache_key[2])
+        return text
+
+
+llm_client = LLMClient()
+
+
+def get_llm_client():
+    return llm_client
@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "gemini" calls the Gemini API; "fake" answers locally, for offline development and load tests
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+# Seconds the fake provider takes per call
+LLM_FAKE_LATENCY_SECONDS = float(os.getenv("LLM_FAKE_LATENCY_SECONDS", "0.2"))
+# Fake response template; fields: {model}, {prompt} (first 200 characters), {prompt_chars}
+LLM_FAKE_RESPONSE = os.getenv(
+    "LLM_FAKE_RESPONSE",
+    "## Summary\n\nLocal response from {model} to a {prompt_chars}-character prompt.\n\n- {prompt}"
+)
+# Optional JSON file of {"text in the prompt": "response template"}; the first match wins
+LLM_FAKE_RESPONSES_FILE = os.getenv("LLM_FAKE_RESPONSES_FILE")
+
+
+def prompt_text(contents):
+    """Text parts of generate_content contents (a string, or a list of strings, blobs and turns)"""
+    if isinstance(contents, str):
+        return contents
+    if isinstance(contents, dict):
+        return prompt_text(contents.get("parts", []))
+    if isinstance(contents, (list, tuple)):
+        return "\n".join(filter(None, (prompt_text(part) for part in contents)))
+    return ""
+
+
+class GeminiProvider:
+    """
+    Gemini models through google.generativeai. The API key is only read, and the SDK
+    only configured, when the first model is requested.
+    """
+
+    name = "gemini"
+
+    def __init__(self, api_key=None):
+        self._api_key = api_key
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def model(self, model_name):
+        with self._lock:
+            model = self._models.get(model_name)
+            if model is None:
+                import google.generativeai as genai
+
+                api_key = self._api_key or os.getenv("GEMINI_API_KEY")
+                if not api_key:
+                    raise RuntimeError("GEMINI_API_KEY environment variable is required for LLM_PROVIDER=gemini")
+                genai.configure(api_key=api_key)
+                model = genai.GenerativeModel(model_name)
+                self._models[model_name] = model
+            return model
+
+
+class FakeModel:
+    """
+    Deterministic stand-in for a GenerativeModel: waits `latency` seconds and answers
+    with the first canned response whose key appears in the prompt, else `template`.
+    """
+
+    def __init__(self, model_name, latency=LLM_FAKE_LATENCY_SECONDS, template=LLM_FAKE_RESPONSE, responses=None):
+        self.model_name = f"fake/{model_name}"
+        self._generation_config = {}
+        self.latency = latency
+        self.template = template
+        self.responses = responses or {}
+
+    def _response(self, contents):
+        prompt = prompt_text(contents)
+        template = next((text for key, text in self.responses.items() if key in prompt), self.template)
+        # Placeholders are replaced literally so canned JSON responses need no brace escaping
+        text = (template.replace("{model}", self.model_name).replace("{prompt_chars}", str(len(prompt)))
+                .replace("{prompt}", prompt[:200]))
+        # Roughly four characters per token, as reported by Gemini for English text
+        prompt_tokens, output_tokens = len(prompt) // 4, len(text) // 4
+        usage = SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=output_tokens,
+                                total_token_count=prompt_tokens + output_tokens)
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+    def generate_content(self, contents, **kwargs):
+        time.sleep(self.latency)
+        return self._response(contents)
+
+    async def generate_content_async(self, contents, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._response(contents)
+
+
+class FakeProvider:
+    """Local provider of FakeModels; no network access or API key needed"""
+
+    name = "fake"
+
+    def __init__(self, latency=LLM_FAKE_LATENCY_SECONDS, template=LLM_FAKE_RESPONSE, responses_file=LLM_FAKE_RESPONSES_FILE):
+        self.latency = latency
+        self.template = template
+        self.responses = {}
+        if responses_file:
+            with open(responses_file, encoding="utf-8") as f:
+                self.responses = json.load(f)
+
+    def model(self, model_name):
+        return FakeModel(model_name, self.latency, self.template, self.responses)
+
+
+PROVIDERS = {"gemini": GeminiProvider, "fake": FakeProvider}
+
+
+def create_provider(name=LLM_PROVIDER):
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown LLM_PROVIDER '{name}'; expected one of {sorted(PROVIDERS)}")
+    return PROVIDERS[name]()
+
+
+llm_provider = create_provider()
+
+
+def get_llm_provider():
+    return llm_provider
+
+
+def get_model(model_name):
+    """Model `model_name` of the configured provider, for use with the LLM client"""
+    return llm_provider.model(model_name)
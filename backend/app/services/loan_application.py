@@ -1,23 +1,36 @@
 from .loan_screening import (
-    predict_loan_application,
-    load_and_preprocess_data,
-    ls_train_test_split,
-    train_ordinal_gbm,
     generate_lime_explanation,
-    encode_df,
-    generate_shap_explanation,
     generate_aggregated_lime,
-    clean_lime_feature_name,
+    lime_chart_data,
+    shap_chart_data,
     RISK_CATEGORY_MAP)
 
 from . import explanation
+from .model_registry import get_registry
+from .batch_scoring import score_applications, score_stream, make_records_serializable, DEFAULT_CHUNK_SIZE
+from .data_io import read_applications
+from .fast_predict import feature_matrix
+from .explanation_store import get_explanation_store
+from .explanation_records import ExplanationRecords, LIME, SHAP, FIVE_C
+from .chart_rendering import get_render_pool, CHARTS
+from .artifact_cache import get_artifact_cache, content_key
 import pandas as pd
 import numpy as np
 from pydantic import BaseModel
-from typing import Dict, List
+from typing import Dict, List, Optional
 import numpy as np
 import math
 
+# Stages of report generation, in order, with the share of the work done when each starts
+REPORT_STAGES = {
+    "queued": 0.0,
+    "explaining": 0.05,
+    "rendering_charts": 0.3,
+    "writing_text": 0.5,
+    "building_pdf": 0.85,
+    "done": 1.0,
+}
+
 class LimeFeature(BaseModel):
     feature: str
     impact: float
@@ -31,33 +44,30 @@ class MLAnalysisResponse(BaseModel):
     fiveCAnalysis: Dict[str, float]
     improvements: List[str]
     aiSummary: str
+    modelVersion: Optional[str] = None
+    shapFeatures: List[LimeFeature] = []
 
 
 class BaseLoanProcessor:
     """Base class to ensure consistent processing across batch and individual operations"""
     
-    def __init__(self, train_csv_path="../../sample_data/apps_synthetic_data.csv"):
+    def __init__(self, train_csv_path="backend/sample_data/apps_synthetic_data.csv", artifact=None):
         self.train_csv_path = train_csv_path
+        self.artifact = artifact
         self._setup_model()
     
     def _setup_model(self):
-        """Setup and train the model using training data"""
-        # Load and preprocess training data
-        self.train_df = load_and_preprocess_data(self.train_csv_path)
+        """Use the shared warm model unless a specific artifact was handed in"""
+        if self.artifact is None:
+            self.artifact = get_registry().get()
         
-        # Train model
-        X_train, X_test, y_train, y_test = ls_train_test_split(self.train_df)
-        self.trained_model = train_ordinal_gbm(X_train, y_train)
-        self.X_train = X_train
+        self.trained_model = self.artifact.model
+        self.X_train = self.artifact.X_train
     
-    def _preprocess_application_data(self, csv_path, application_id=None):
+    def _preprocess_application_data(self, raw_df, application_id=None):
         """Consistent preprocessing for both batch and individual processing"""
-        # Load and preprocess test data
-        processed_df = load_and_preprocess_data(csv_path)
-        
-        # Set index and encode
-        indexed_df = processed_df.set_index('application_id')
-        encoded_df = encode_df(indexed_df)
+        # Apply the transform frozen at training time; no statistics come from the scored file
+        encoded_df = self.artifact.transform.transform(raw_df)
         
         if application_id:
             # Return specific application
@@ -67,53 +77,45 @@ class BaseLoanProcessor:
             return encoded_df
     
     def predict_single_application(self, application_data):
-        """Consistent prediction method"""
-        return predict_loan_application(self.trained_model, application_data)
+        """Consistent prediction method, using the artifact's compiled trees"""
+        compiled = self.artifact.compiled
+        return compiled.predict_row(feature_matrix(application_data, compiled.feature_names)[0])
 
 class BatchProcessor(BaseLoanProcessor):
     """Handles batch processing of multiple applications"""
     
     def categorize(self, test_csv_path):
-        # Get encoded test data
-        encoded_test_df = self._preprocess_application_data(test_csv_path)
-        
-        # Load raw data for final results
-        raw_test_df = pd.read_csv(test_csv_path)
-        
-        # Process all applications
-        predicted_categories = []
-        probabilities_list = []
+        # Load raw data once (CSV, Parquet or Arrow); it feeds both the model and the final results
+        raw_test_df = read_applications(test_csv_path)
         
-        for app_id in encoded_test_df.index:
-            application_data = encoded_test_df.loc[[app_id]]
-            cat, prob = self.predict_single_application(application_data)
-            predicted_categories.append(cat)
-            probabilities_list.append(prob)
-        
-        # Create result dataframe
-        app_ids = encoded_test_df.index.to_list()
-        result_df = raw_test_df[raw_test_df['application_id'].isin(app_ids)].copy()
-        result_df = result_df.set_index('application_id').loc[app_ids].reset_index()
-        
-        result_df["risk_category"] = predicted_categories
-        result_df["probabilities"] = [prob.tolist() for prob in probabilities_list]    
+        # Score every application in one call instead of one predict per row
+        result_df = score_applications(self.artifact, raw_test_df)
 
         # Apply serialization to the entire result
-        for record in result_df.to_dict('records'):
-            for key, value in record.items():
-                record[key] = make_serializable(value)
-                            
-        return result_df.to_dict('records')
+        return make_records_serializable(result_df)
+    
+    def categorize_stream(self, test_csv_path, sink, chunksize=DEFAULT_CHUNK_SIZE, columns=None):
+        """Score a file of any size chunk by chunk into `sink` (see batch_scoring)"""
+        return score_stream(self.artifact, test_csv_path, sink, chunksize, columns=columns)
     
 class DetailedProcessor(BaseLoanProcessor):
     """Handles detailed processing of individual applications (your existing process_application class logic)"""
     
-    def __init__(self, csv_path, train_csv_path="backend/sample_data/apps_synthetic_data.csv"):
-        super().__init__(train_csv_path)
+    def __init__(self, csv_path, train_csv_path="backend/sample_data/apps_synthetic_data.csv", artifact=None,
+                 session_key=None):
+        super().__init__(train_csv_path, artifact=artifact)
         self.csv_path = csv_path
-        self.results_df = pd.read_csv(csv_path)
-        # Add the missing attributes from your original process_application class
-        self.processed_df = load_and_preprocess_data(csv_path)
+        # Explanations computed for this file are shared across requests under this key
+        self.session_key = session_key or str(csv_path)
+        self.results_df = read_applications(csv_path)
+        # Raw rows by application ID, indexed once rather than on every lookup
+        self._raw_by_id = self.results_df.set_index('application_id', drop=False)
+        # Encode every application once with the frozen training-time transform
+        self.encoded_df = self._preprocess_application_data(self.results_df)
+        # Numeric view of the same rows for the compiled single-row predictor
+        self.feature_matrix = feature_matrix(self.encoded_df, self.artifact.compiled.feature_names)
+        # LIME/SHAP/5C weights of the applications explained so far; results_df is never modified
+        self.explanation_records = ExplanationRecords()
         # Cache for reused values
         self._cached_results = {}
     
@@ -122,24 +124,23 @@ class DetailedProcessor(BaseLoanProcessor):
         if application_id in self._cached_results:
             return self._cached_results[application_id]
         
-        # Prepare data (same as in process_specific_application)
-        indexed_df = self.processed_df.set_index('application_id')
-        self.encoded_df = encode_df(indexed_df)
-        
         # get application data
         application_data = self.encoded_df.loc[[application_id]]
-        data_row = self.results_df.set_index('application_id').loc[application_id].to_dict()
-        data_row["application_id"] = application_id
+        data_row = self._raw_by_id.loc[application_id].to_dict()
         
         # predict and append
-        predicted_category, probabilities = predict_loan_application(self.trained_model, application_data)
+        row_position = self.encoded_df.index.get_loc(application_id)
+        predicted_category, probabilities = self.artifact.compiled.predict_row(self.feature_matrix[row_position])
         data_row["predicted_category"] = predicted_category
         data_row["probabilities"] = probabilities
         
         # get LIME explanation
-        lime_explanation, _ = generate_lime_explanation(self.results_df, application_id,
-                                                        self.trained_model, application_data,
-                                                        X_train=self.X_train)
+        lime_explanation = generate_lime_explanation(application_id,
+                                                     self.trained_model, application_data,
+                                                     X_train=self.X_train,
+                                                     explainer=self.artifact.lime_explainer,
+                                                     records=self.explanation_records,
+                                                     export=False)
         
         # Cache the results
         self._cached_results[application_id] = {
@@ -152,6 +153,10 @@ class DetailedProcessor(BaseLoanProcessor):
         
         return self._cached_results[application_id]
     
+    def session_explanations(self):
+        """SHAP values for every application in the session, from one batched TreeSHAP call per model version"""
+        return get_explanation_store().get_or_compute(self.artifact, self.session_key, self.encoded_df)
+    
     def process_specific_application(self, application_id):
         # Get cached analysis
         analysis = self._get_application_analysis(application_id)
@@ -159,30 +164,36 @@ class DetailedProcessor(BaseLoanProcessor):
         application_data = analysis['application_data']
         predicted_category = analysis['predicted_category']
         probabilities = analysis['probabilities']
-        lime_explanation = analysis['lime_explanation']
         
         prob_dict = {}
         for i, category in enumerate(RISK_CATEGORY_MAP.values()):
             prob_dict[category] = float(probabilities[i])
 
-        # Extract LIME features
+        # Top LIME and SHAP features, read back from the explanation records
         predicted_numeric_class = [k for k, v in RISK_CATEGORY_MAP.items() if v == predicted_category][0]
-        lime_list = lime_explanation.as_list(label=predicted_numeric_class)
+        lime_features = [
+            LimeFeature(
+                feature=feature,
+                impact=weight,
+                description=f"{'Reduces' if weight > 0 else 'Increases'} risk by {abs(weight):.3f}"
+            )
+            for feature, weight in self.explanation_records.top(LIME, application_id, predicted_numeric_class)
+        ]
 
-        lime_features = []
-        for name, weight in lime_list[:5]:  # Top 5 features
-            cleaned_name = clean_lime_feature_name(name, self.results_df)
-            description = f"{'Reduces' if weight > 0 else 'Increases'} risk by {abs(weight):.3f}"
-        
-            lime_features.append(LimeFeature(
-                feature=cleaned_name,
-                impact=float(weight),
-                description=description
-            ))
+        five_c_scores = self.five_c_scores(application_id)
 
-        five_c_scores, _ = generate_aggregated_lime(
-            self.results_df, application_id, lime_explanation, predicted_category
-        )
+        # This application's SHAP values come from the session-level batch
+        shap_values, _, shap_class = self.session_explanations().for_application(application_id)
+        self.explanation_records.add(SHAP, application_id, shap_class, self.session_explanations().feature_names,
+                                     shap_values)
+        shap_features = [
+            LimeFeature(
+                feature=feature,
+                impact=weight,
+                description=f"{'Supports' if weight > 0 else 'Weighs against'} the {predicted_category} rating by {abs(weight):.3f}"
+            )
+            for feature, weight in self.explanation_records.top(SHAP, application_id, shap_class)
+        ]
 
         # Generate improvements - FIX THE AMBIGUOUS SERIES ISSUE
         improvements = []
@@ -231,50 +242,114 @@ class DetailedProcessor(BaseLoanProcessor):
             limeFeatures=lime_features,
             fiveCAnalysis={k: round(float(v), 3) for k, v in five_c_scores.items()},
             improvements=improvements,
-            aiSummary=ai_summary
+            aiSummary=ai_summary,
+            modelVersion=self.artifact.version,
+            shapFeatures=shap_features
         )
     
-    def generate_report(self, application_id):
-        """Generate full report using the same analysis as process_specific_application"""
+    def chart_data(self, application_id, chart):
+        """Inputs of one chart (a chart_rendering.CHARTS key) of an application"""
+        if chart not in CHARTS:
+            raise ValueError(f"Unknown chart {chart!r}; expected one of {list(CHARTS)}")
+        analysis = self._get_application_analysis(application_id)
+
+        if chart == "lime":
+            return lime_chart_data(application_id, analysis['lime_explanation'])
+        if chart == "shap":
+            shap_values, _, _ = self.session_explanations().for_application(application_id)
+            chart_data = shap_chart_data(application_id, shap_values, self.session_explanations().feature_names,
+                                         analysis['predicted_category'])
+            if chart_data is None:
+                raise ValueError(f"All SHAP values of application {application_id} are zero; there is no chart to draw")
+            return chart_data
+
+        return dict(aggregated_scores=self.five_c_scores(application_id),
+                    predicted_category=analysis['predicted_category'])
+    
+    def five_c_scores(self, application_id):
+        """5C scores of an application, aggregated from its LIME explanation once and then read from the records"""
+        analysis = self._get_application_analysis(application_id)
+        predicted_numeric_class = [k for k, v in RISK_CATEGORY_MAP.items() if v == analysis['predicted_category']][0]
+        scores = self.explanation_records.weights(FIVE_C, application_id, predicted_numeric_class)
+        if not scores:
+            scores = generate_aggregated_lime(application_id, analysis['lime_explanation'],
+                                              analysis['predicted_category'], self.X_train.columns,
+                                              records=self.explanation_records)
+        return scores
+    
+    def render_chart(self, application_id, chart):
+        """
+        Draw one chart of an application on the render pool and return its PNG path in
+        the artifact cache. A chart whose inputs did not change is not redrawn.
+        """
+        return get_render_pool().render(chart, **self.chart_data(application_id, chart))
+    
+    def report_key(self, application_id, additional_instructions=''):
+        """
+        Content key of an application's report: its raw row, the model version and the
+        report prompt template. Explanations are deterministic given the first two.
+        """
+        return content_key("report", self._raw_by_id.loc[application_id].to_dict(), self.artifact.version,
+                           explanation.full_report_template_key(), additional_instructions)
+    
+    def stored_report(self, application_id, additional_instructions=''):
+        """(PDF bytes, report key) of an already generated report, or (None, report key)"""
+        report_key = self.report_key(application_id, additional_instructions)
+        report_path = get_artifact_cache().get(report_key, ".pdf")
+        if report_path is None:
+            return None, report_key
+        with open(report_path, "rb") as f:
+            return f.read(), report_key
+    
+    def report_pdf(self, application_id, additional_instructions='', progress=None):
+        """
+        (PDF bytes, report key) of the application's report, rendered in memory.
+        Charts, report text and PDF are each cached by content key, so a repeat
+        report is a single file lookup; the report key doubles as the PDF's ETag.
+        `progress(stage)` is called as each of REPORT_STAGES starts.
+        """
+        progress = progress or (lambda stage: None)
+        pdf, report_key = self.stored_report(application_id, additional_instructions)
+        if pdf is not None:
+            return pdf, report_key
+
+        cache = get_artifact_cache()
         # Get cached analysis (reuses same values as process_specific_application)
+        progress("explaining")
         analysis = self._get_application_analysis(application_id)
         
-        application_data = analysis['application_data']
-        predicted_category = analysis['predicted_category']
-        probabilities = analysis['probabilities']
-        lime_explanation = analysis['lime_explanation']
-        
-        # Generate SHAP explanation (only needed for report)
-        shap_explanation, _ = generate_shap_explanation(self.results_df, application_id,
-                                                       self.trained_model, application_data,
-                                                       X_train=self.X_train, 
-                                                       filename=f"shap_explanation_{application_id}.png")
-        
-        # Generate aggregated LIME with visualization (only needed for report)
-        aggregated_lime_scores, results_df = generate_aggregated_lime(
-                                                    df=self.results_df,
-                                                    application_id=application_id,
-                                                    lime_explanation=lime_explanation,
-                                                    predicted_category=predicted_category,
-                                                    filename=f"lime_aggregated_plot_{application_id}.png"
-        )
+        # Draw the three charts in parallel on the render pool
+        progress("rendering_charts")
+        render_pool = get_render_pool()
+        chart_futures = {chart: render_pool.submit(chart, **self.chart_data(application_id, chart))
+                         for chart in ("lime", "shap", "five_c")}
+        chart_paths = {chart: future.result() for chart, future in chart_futures.items()}
         
-        # Generate LIME visualization (only needed for report)
-        _, _ = generate_lime_explanation(self.results_df, application_id,
-                                        self.trained_model, application_data,
-                                        X_train=self.X_train,
-                                        filename=f"lime_explanation_{application_id}.png")
+        aggregated_lime_scores = self.five_c_scores(application_id)
         
-        # Generate full report using the same values
-        text = explanation.explain_ai(gen_type='full_report',
-                                    df=self.results_df,
-                                    application_id=application_id, 
-                                    lime_explanation=lime_explanation, 
-                                    aggregated_lime_scores=aggregated_lime_scores, 
-                                    X_train=self.X_train, 
-                                    probabilities=probabilities,
-                                    additional_instructions='')
+        # Generate the report text once per content key
+        text_key = content_key("report_text", report_key)
+        text = cache.get_text(text_key, ".md")
+        if text is None:
+            progress("writing_text")
+            text = explanation.generate_full_report_text(self.results_df, application_id,
+                                                         analysis['lime_explanation'],
+                                                         aggregated_lime_scores,
+                                                         analysis['probabilities'],
+                                                         lime_image_path=chart_paths["lime"],
+                                                         aggregatedlime_image_path=chart_paths["five_c"],
+                                                         shap_image_path=chart_paths["shap"],
+                                                         additional_instructions=additional_instructions)
+            cache.put_text(text_key, text, ".md")
         
+        progress("building_pdf")
+        pdf = explanation.render_pdf_bytes(text, extra_images=[chart_paths["lime"], chart_paths["five_c"], chart_paths["shap"]])
+        cache.put_bytes(report_key, ".pdf", pdf)
+        return pdf, report_key
+    
+    def generate_report(self, application_id):
+        """Generate full report using the same analysis as process_specific_application"""
+        self.report_pdf(application_id)
         return True
 
 def make_serializable(obj):
@@ -288,6 +363,6 @@ def make_serializable(obj):
         return float(obj)
     return obj
 
-def categorize(test_csv_path):
-    processor = BatchProcessor()
+def categorize(test_csv_path, artifact=None):
+    processor = BatchProcessor(artifact=artifact)
     return processor.categorize(test_csv_path)
\ No newline at end of file
@@ -1,9 +1,10 @@
 import os
+import functools
 import pandas as pd
 import numpy as np
 import lightgbm as lgb
+from scipy import sparse
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import classification_report, confusion_matrix
 import shap
 import lime
@@ -12,39 +13,69 @@ import matplotlib.pyplot as plt
 
 import matplotlib.pyplot as plt
 from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import seaborn as sns
-from sklearn.preprocessing import LabelEncoder
+
+from .data_io import read_applications
+from .explanation_records import LIME, FIVE_C
+from .chart_rendering import get_render_pool
 
 ENCODER_STORE = {}
 
-# Dictionary to store fitted encoders globally (per column)
+# Dictionary to store the fitted category list globally (per column)
+
+# Label used for missing categorical values so they form their own category
+MISSING_CATEGORY = "nan"
 
 non_features = ['application_id', 'application_date', 'first_name', 'middle_name',
        'last_name', 'contact_number', 'email_address']
 
+RISK_WEIGHTS = {
+    'credit_limit': 0.1, 'gross_monthly_income': 0.2, 'bpi_loans_taken': 0.3,
+    'bpi_successful_loans': 0.2, 'gcash_avg_monthly_deposits': 0.1, 'data_usage_patterns': 0.1
+}
+
 # --- Step 1 & 2: Input Data and Y Variable Creation ---
 
-def load_and_preprocess_data(filepath="outdir/synthetic_data.csv"):
+def as_category_labels(series):
+    """String labels for a categorical column, with missing values as MISSING_CATEGORY"""
+    return series.astype(object).where(series.notna(), MISSING_CATEGORY).astype(str)
+
+def categorical_codes(X):
+    """
+    Numeric view of a feature frame: category columns become their integer codes
+    (NaN where the value is missing or unknown). LightGBM reads these codes the same
+    way it reads the pandas categoricals it was trained on, so LIME/SHAP can work on
+    plain float arrays.
+    """
+    X = X.copy()
+    for col in X.select_dtypes(include=['category']).columns:
+        codes = X[col].cat.codes.astype(float)
+        X[col] = codes.where(codes >= 0)
+    return X
+
+def load_and_preprocess_data(filepath="outdir/synthetic_data.csv", df=None):
     """
     Loads the dataset, preprocesses it, and creates the dynamic risk score and category.
+    `filepath` may be a CSV, Parquet or Arrow file. Pass an already loaded `df`
+    to skip reading it; the passed frame is not modified.
     """
-    df = pd.read_csv(filepath)
-    categorical_cols = df.select_dtypes(include=['object']).columns
+    df = read_applications(filepath) if df is None else df.copy()
+    categorical_cols = df.select_dtypes(include=['object', 'string']).columns
     for col in categorical_cols:
         if col not in non_features:
-            df[col] = df[col].astype(str)
-            le = LabelEncoder()
-            df[col] = le.fit_transform(df[col])
-            ENCODER_STORE[col] = le
+            # Sorted categories give the same codes LabelEncoder used to assign
+            df[col] = pd.Categorical(as_category_labels(df[col]))
+            ENCODER_STORE[col] = list(df[col].cat.categories)
     feature_cols = [col for col in df.columns if col not in non_features and df[col].dtype in [float, int]]
     df[feature_cols] = df[feature_cols].fillna(df[feature_cols].median())
-    weights = {
-        'credit_limit': 0.1, 'gross_monthly_income': 0.2, 'bpi_loans_taken': 0.3,
-        'bpi_successful_loans': 0.2, 'gcash_avg_monthly_deposits': 0.1, 'data_usage_patterns': 0.1
-    }
+    weights = RISK_WEIGHTS
     for col in weights.keys():
         if col in df.columns:
-            df[col] = (df[col] - df[col].min()) / (df[col].max() - df[col].min())
+            # Categoricals that feed the risk index are scored (and kept) as scaled codes
+            values = df[col].cat.codes.astype(float) if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col]
+            df[col] = (values - values.min()) / (values.max() - values.min())
     alternative_data_boost = (df['bpi_loans_taken'] <= df['bpi_loans_taken'].quantile(0.25)).astype(int) * 0.15
     df['risk_index_score'] = (
         df['credit_limit'] * (weights['credit_limit'] - alternative_data_boost/2) +
@@ -90,36 +121,54 @@ def ls_train_test_split(df):
     
     return X_train, X_test, y_train, y_test
 
-def train_gradient_boosting(X_train, y_train):
+def features_train_test_split(X, y):
+    """Same split as ls_train_test_split for an already built feature matrix and labels"""
+    return train_test_split(X, y, test_size=0.25, random_state=42, stratify=y)
+
+ORDINAL_GBM_PARAMS = {
+    'objective': 'multiclass', 'num_class': 5, 'random_state': 42,
+    'n_estimators': 150, 'learning_rate': 0.05, 'num_leaves': 31,
+    # Regularize native categorical splits; address_city alone has ~600 categories
+    'min_data_per_group': 100, 'cat_smooth': 100
+}
+
+def train_gradient_boosting(X_train, y_train, params=None):
     print("\n--- Training Standard Gradient Boosting Classifier ---")
-    model = lgb.LGBMClassifier(objective='multiclass', num_class=5, random_state=42) # if yvar is risk_category
+    model = lgb.LGBMClassifier(objective='multiclass', num_class=5, random_state=42, **(params or {})) # if yvar is risk_category
 
     model.fit(X_train, y_train)
     return model
 
-def train_ordinal_gbm(X_train, y_train):
-    print("\n--- Training Ordinal GBM (as Multiclass) ---")
-    model = lgb.LGBMClassifier(
-        objective='multiclass', num_class=5, random_state=42,
-        n_estimators=150, learning_rate=0.05, num_leaves=31
-    )
-    model.fit(X_train, y_train)
+def train_ordinal_gbm(X_train, y_train, params=None, verbose=True):
+    """`params` override ORDINAL_GBM_PARAMS, e.g. a candidate picked by model_tuning"""
+    if verbose:
+        print("\n--- Training Ordinal GBM (as Multiclass) ---")
+    model = lgb.LGBMClassifier(**{**ORDINAL_GBM_PARAMS, **(params or {})})
+    # Category-dtype columns in X_train are picked up as native LightGBM categorical features
+    model.fit(X_train, y_train, categorical_feature='auto')
     return model
 
+def continue_ordinal_gbm(base_model, X_new, y_new, n_rounds, params=None):
+    """
+    Add `n_rounds` boosting rounds to a trained model using only new rows (LightGBM
+    init_model). X_new must come from the same frozen transform as the base model.
+    """
+    print(f"\n--- Continuing Ordinal GBM for {n_rounds} rounds on {len(X_new)} new rows ---")
+    model = lgb.LGBMClassifier(**{**ORDINAL_GBM_PARAMS, **(params or {}), 'n_estimators': n_rounds})
+    model.fit(X_new, y_new, init_model=base_model.booster_, categorical_feature='auto')
+    return model
 
-def evaluate_model(model, X_test, y_test, target_names):
-    y_pred = model.predict(X_test)
 
-    # Print reports
-    print("\nClassification Report:")
-    print(classification_report(y_test, y_pred, target_names=target_names))
-
-    # Confusion matrix
-    cm = confusion_matrix(y_test, y_pred)
+def plot_confusion_matrix(cm, target_names, filename):
+    """
+    Save a row-normalized confusion matrix heatmap to `filename`. Uses a standalone
+    Figure rather than pyplot state, so it works headless and in worker processes.
+    """
     cm_normalized = cm.astype("float") / cm.sum(axis=1)[:, np.newaxis]  # row-normalized
 
-    # Plot confusion matrix
-    plt.figure(figsize=(8, 6))
+    fig = Figure(figsize=(8, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
     sns.heatmap(
         cm_normalized,
         annot=True,
@@ -129,16 +178,31 @@ def evaluate_model(model, X_test, y_test, target_names):
         yticklabels=target_names,
         cbar=True,
         linewidths=0.5,
-        linecolor="gray"
+        linecolor="gray",
+        ax=ax
     )
 
-    plt.title("Confusion Matrix", fontsize=16, weight="bold", color="#7B1113")
-    plt.xlabel("Predicted", fontsize=12, weight="bold")
-    plt.ylabel("Actual", fontsize=12, weight="bold")
-    plt.xticks(rotation=45)
-    plt.yticks(rotation=0)
-    plt.tight_layout()
-    plt.show()
+    ax.set_title("Confusion Matrix", fontsize=16, weight="bold", color="#7B1113")
+    ax.set_xlabel("Predicted", fontsize=12, weight="bold")
+    ax.set_ylabel("Actual", fontsize=12, weight="bold")
+    ax.tick_params(axis="x", labelrotation=45)
+    ax.tick_params(axis="y", labelrotation=0)
+    fig.tight_layout()
+    fig.savefig(filename)
+    return filename
+
+def evaluate_model(model, X_test, y_test, target_names, filename="outdir/confusion_matrix.png"):
+    y_pred = model.predict(X_test)
+
+    # Print reports
+    print("\nClassification Report:")
+    print(classification_report(y_test, y_pred, target_names=target_names))
+
+    # Confusion matrix
+    cm = confusion_matrix(y_test, y_pred)
+    plot_confusion_matrix(cm, target_names, filename)
+    print(f"Confusion matrix saved to {filename}")
+    return cm
     
 def generate_shap_waterfall_plot(model, X, instance_index, filename="shap_waterfall.png"): # improve
     explainer = shap.TreeExplainer(model)
@@ -160,11 +224,24 @@ RISK_CATEGORY_MAP = {
 }
 
 def predict_loan_application(model, application_features):
-    prediction = model.predict(application_features)[0]
+    # One predict_proba call; the category is its argmax, exactly as model.predict would return
     probabilities = model.predict_proba(application_features)[0]
+    prediction = model.classes_[probabilities.argmax()]
     risk_category = RISK_CATEGORY_MAP[prediction]
     return risk_category, probabilities
 
+RISK_CATEGORY_NAMES = np.array([RISK_CATEGORY_MAP[k] for k in sorted(RISK_CATEGORY_MAP)], dtype=object)
+
+def predict_loan_applications(model, applications_features):
+    """
+    Score a whole feature matrix with a single predict_proba call.
+    The category is the argmax of the probabilities, matching model.predict.
+    """
+    probabilities = model.predict_proba(applications_features)
+    predictions = model.classes_[probabilities.argmax(axis=1)]
+    risk_categories = RISK_CATEGORY_NAMES[predictions]
+    return risk_categories, probabilities
+
 def clean_lime_feature_name(name, feature_list):
     """
     Extract the actual feature name from LIME bin strings.
@@ -175,38 +252,109 @@ def clean_lime_feature_name(name, feature_list):
             return f
     return ''.join([c for c in name if not c.isdigit() and c not in '<>=. '])
 
-def generate_lime_explanation(df, application_id, 
-                              model, sample_application,
-                              X_train,
-                              RISK_CATEGORY_MAP=RISK_CATEGORY_MAP,
-                              filename="lime_explanation.png", outdir="outdir"):
-    if outdir:
-        os.makedirs(outdir, exist_ok=True)
-        filepath = os.path.join(outdir, filename)
-    
-    # --- Select the row by application_id column ---
-    row_mask = df['application_id'] == application_id
-    data_row = sample_application.values[0]
-    
-    num_features = X_train.shape[1]
-    explainer = lime.lime_tabular.LimeTabularExplainer(
-        training_data=X_train.values, 
+# LIME's default sample count per explanation; the perturbation bank holds all but the instance row
+LIME_NUM_SAMPLES = 5000
+LIME_BANK_SEED = 42
+
+class BankedLimeTabularExplainer(lime.lime_tabular.LimeTabularExplainer):
+    """
+    LimeTabularExplainer that reuses one seeded perturbation bank for every instance.
+
+    With the quartile discretizer, LIME's perturbations are a bin (or category) drawn per
+    column from the training frequencies, then a value drawn inside that bin; none of it
+    depends on the instance. Only the binary "same bin as the instance" matrix does. So
+    the bank is drawn and scored by the model once, stored as compact bin codes plus
+    probabilities, and re-centered on each instance by comparing bins. Each explanation
+    then scores a single row, and is deterministic.
+    """
+
+    def __init__(self, training_data, predict_fn, num_samples=LIME_NUM_SAMPLES, seed=LIME_BANK_SEED, **kwargs):
+        super().__init__(training_data, discretize_continuous=True, random_state=seed, **kwargs)
+        self.predict_fn = predict_fn
+
+        rng = np.random.RandomState(seed)
+        bins = np.column_stack([
+            rng.choice(self.feature_values[col], size=num_samples - 1, replace=True, p=self.feature_frequencies[col])
+            for col in range(training_data.shape[1])
+        ])
+        self.bank_bins = bins.astype(np.min_scalar_type(int(bins.max())))
+        # One batched model call for the whole bank
+        self.bank_probabilities = predict_fn(self.discretizer.undiscretize(bins.astype(float)))
+
+    def _LimeTabularExplainer__data_inverse(self, data_row, num_samples, *args):
+        # Re-center the bank on this instance; only row 0 (the instance) needs scoring
+        first_row = self.discretizer.discretize(data_row)
+        data = np.vstack([np.ones(len(data_row)), (self.bank_bins == first_row).astype(float)])
+        return data, data_row.reshape(1, -1)
+
+    def explain_instance(self, data_row, predict_fn=None, **kwargs):
+        if predict_fn is not None and predict_fn != self.predict_fn:
+            raise ValueError("This LIME perturbation bank was scored with a different model")
+
+        def banked_predict_fn(instance):
+            return np.vstack([self.predict_fn(instance), self.bank_probabilities])
+
+        kwargs['num_samples'] = len(self.bank_bins) + 1
+        return super().explain_instance(data_row, banked_predict_fn, **kwargs)
+
+def build_lime_explainer(X_train, RISK_CATEGORY_MAP=RISK_CATEGORY_MAP, predict_fn=None):
+    """
+    LIME explainer over the numeric view of X_train, with the model's native
+    categorical columns declared as categorical so LIME samples and names them by category.
+    Given the model's `predict_fn`, returns a BankedLimeTabularExplainer bound to that model.
+    """
+    categorical_features = [i for i, col in enumerate(X_train.columns)
+                            if isinstance(X_train[col].dtype, pd.CategoricalDtype)]
+    categorical_names = {i: list(X_train[X_train.columns[i]].cat.categories) for i in categorical_features}
+    explainer_kwargs = dict(
+        training_data=categorical_codes(X_train).values,
         feature_names=X_train.columns.tolist(),
-        class_names=list(RISK_CATEGORY_MAP.values()), 
+        class_names=list(RISK_CATEGORY_MAP.values()),
+        categorical_features=categorical_features,
+        categorical_names=categorical_names,
         mode='classification'
     )
-    
-    # --- Predict numeric class and probabilities ---
-    predicted_numeric_class = model.predict(data_row.reshape(1, -1))[0]
-    predicted_category_name = RISK_CATEGORY_MAP[predicted_numeric_class]
-
-    # --- Generate explanation ---
-    explanation = explainer.explain_instance(
-        data_row,
-        predict_fn=model.predict_proba,
-        num_features=num_features,
-        labels=[predicted_numeric_class]  # optional; tries to generate for predicted class
-    )
+    if predict_fn is not None:
+        return BankedLimeTabularExplainer(predict_fn=predict_fn, **explainer_kwargs)
+    return lime.lime_tabular.LimeTabularExplainer(**explainer_kwargs)
+
+def lime_data_row(explainer, sample_application):
+    """Numeric row for LIME; categories unseen in training are explained as the missing category"""
+    data_row = categorical_codes(sample_application).values[0].astype(float)
+    for i in explainer.categorical_features:
+        if np.isnan(data_row[i]):
+            names = explainer.categorical_names[i]
+            data_row[i] = names.index(MISSING_CATEGORY) if MISSING_CATEGORY in names else 0
+    return data_row
+
+def generate_lime_explanation(application_id,
+                              model, sample_application,
+                              X_train,
+                              RISK_CATEGORY_MAP=RISK_CATEGORY_MAP,
+                              filename="lime_explanation.png", outdir="outdir",
+                              explainer=None, explanation=None, records=None, export=True):
+    """
+    Explain one application with LIME and, if `export`, write the HTML/PNG views.
+    Pass the model artifact's cached `explainer` to avoid rebuilding it from X_train,
+    or an already computed `explanation` to only export it.
+    The feature weights are added to `records` (ExplanationRecords) when given.
+    """
+    if explanation is None:
+        num_features = X_train.shape[1]
+        if explainer is None:
+            explainer = build_lime_explainer(X_train, RISK_CATEGORY_MAP)
+        data_row = lime_data_row(explainer, sample_application)
+        
+        # --- Predict numeric class and probabilities ---
+        predicted_numeric_class = model.predict(data_row.reshape(1, -1))[0]
+
+        # --- Generate explanation ---
+        explanation = explainer.explain_instance(
+            data_row,
+            predict_fn=model.predict_proba,
+            num_features=num_features,
+            labels=[predicted_numeric_class]  # optional; tries to generate for predicted class
+        )
 
     # --- Safely get the actual label LIME explained ---
     if explanation.local_exp:
@@ -214,121 +362,49 @@ def generate_lime_explanation(df, application_id,
     else:
         raise ValueError("LIME explanation contains no local_exp entries")
 
-    # --- Extract cleaned feature names and importances ---
-    feature_names = [clean_lime_feature_name(name, X_train.columns) 
-                     for name, _ in explanation.as_list(label=label_to_use)]
-    feature_importances = [weight for _, weight in explanation.as_list(label=label_to_use)]
-    
-    # --- Add importance columns to df ---
-    for feature_name, weight in zip(feature_names, feature_importances):
-        col_name = f"{feature_name}_LIMEimportance_for_{predicted_category_name}"
-        if col_name not in df.columns:
-            df[col_name] = np.nan
-        df.loc[row_mask, col_name] = weight
+    # --- Record cleaned feature names and importances ---
+    if records is not None:
+        lime_list = explanation.as_list(label=label_to_use)
+        records.add(LIME, application_id, label_to_use,
+                    [clean_lime_feature_name(name, X_train.columns) for name, _ in lime_list],
+                    [weight for _, weight in lime_list])
+
+    if not export:
+        return explanation
+
+    if outdir:
+        os.makedirs(outdir, exist_ok=True)
+    filepath = os.path.join(outdir, filename) if outdir else filename
 
     # --- Export HTML ---
     explanation.save_to_file(filepath.replace('.png', '.html'))
     print(f"LIME explanation HTML saved to {filepath.replace('.png', '.html')}")
     
     # --- Export PNG using the correct label ---
-    fig = explanation.as_pyplot_figure(label=label_to_use)
-    fig.suptitle(
-        f"LIME Explanation for Application {application_id}\n(Predicted: {predicted_category_name})",
-        fontsize=14,
-        y=1.02
+    get_render_pool().render("lime", filepath, **lime_chart_data(application_id, explanation, RISK_CATEGORY_MAP))
+    return explanation
+
+def lime_chart_data(application_id, explanation, RISK_CATEGORY_MAP=RISK_CATEGORY_MAP):
+    """Inputs of the "lime" chart (chart_rendering) for the label a LIME explanation covers"""
+    label = list(explanation.local_exp.keys())[0]
+    lime_list = explanation.as_list(label=label)
+    return dict(
+        feature_labels=[name for name, _ in lime_list],
+        weights=[float(weight) for _, weight in lime_list],
+        class_name=explanation.class_names[label],
+        title=f"LIME Explanation for Application {application_id}\n(Predicted: {RISK_CATEGORY_MAP[label]})"
     )
-    fig.savefig(filepath, bbox_inches="tight")
-    plt.close(fig)
-
-    print(f"LIME plot saved to {filepath}")
-    return explanation, df
 
-def generate_shap_explanation(df, application_id, 
-                              model, sample_application,
-                              X_train, 
-                              RISK_CATEGORY_MAP=RISK_CATEGORY_MAP,
-                              filename="shap_explanation.png", outdir="outdir",
-                              use_tree_explainer=True):
-    if outdir:
-        os.makedirs(outdir, exist_ok=True)
-        filepath = os.path.join(outdir, filename)
-    
-    # --- Select the row by application_id column ---
-    row_mask = df['application_id'] == application_id
-    if not row_mask.any():
-        raise ValueError(f"Application ID {application_id} not found in df['application_id']")
-    data_row = sample_application.values[0]
-    
-    # --- Predict numeric class and category ---
-    predicted_numeric_class = model.predict(data_row.reshape(1, -1))[0]
-    predicted_category_name = RISK_CATEGORY_MAP[predicted_numeric_class]
-    
-    # --- Pick SHAP explainer ---
-    if use_tree_explainer:
-        explainer = shap.TreeExplainer(model)
-    else:
-        explainer = shap.KernelExplainer(model.predict_proba, X_train.sample(50, random_state=42))
-    
-    # --- Compute SHAP values ---
-    shap_values = explainer.shap_values(data_row.reshape(1, -1))  # make 2D for LightGBM
-    
-    if isinstance(shap_values, list):  # multiclass
-        shap_values_for_class = shap_values[predicted_numeric_class][0]
-    else:  # binary
-        shap_values_for_class = shap_values[0]
-    
-    # --- Ensure clean 1D float array ---
-    shap_values_for_class = np.ravel(shap_values_for_class).astype(float)
-    feature_names = X_train.columns.tolist()
-    
-    # --- Align shap values and feature names ---
-    if len(shap_values_for_class) != len(feature_names):
-        min_len = min(len(shap_values_for_class), len(feature_names))
-        shap_values_for_class = shap_values_for_class[:min_len]
-        feature_names = feature_names[:min_len]
-    
-    # --- Filter out zero SHAP values ---
-    nonzero_mask = shap_values_for_class != 0
-    shap_values_nonzero = shap_values_for_class[nonzero_mask]
-    feature_names_nonzero = [f for f, keep in zip(feature_names, nonzero_mask) if keep]
-    
-    # --- Add SHAP values to df ---
-    for feature_name, shap_val in zip(feature_names, shap_values_for_class):
-        col_name = f"{feature_name}_SHAPvalue_for_{predicted_category_name}"
-        if col_name not in df.columns:
-            df[col_name] = np.nan
-        df.loc[row_mask, col_name] = shap_val
-    
-    # --- Export SHAP bar plot for nonzero features ---
-    if len(shap_values_nonzero) > 0:
-        plt.figure(figsize=(8, max(4, len(feature_names_nonzero) * 0.3)))
-        shap.bar_plot(
-            shap_values_nonzero,
-            feature_names=feature_names_nonzero,
-            max_display=len(feature_names_nonzero),
-            show=False
-        )
-        plt.title(f"SHAP Explanation for Application {application_id}\n(Predicted: {predicted_category_name})",
-                  fontsize=14, pad=20)
-        plt.tight_layout(rect=[0, 0, 1, 0.95])
-        plt.savefig(filepath, bbox_inches="tight")
-        plt.close()
-        print(f"SHAP bar plot saved to {filepath}")
-    else:
-        print("All SHAP values are zero — skipping bar plot export.")
-    
-    # --- Export SHAP force plot (HTML) ---
-    force_filepath = filepath.replace('.png', '.html')
-    shap_html = shap.force_plot(
-        explainer.expected_value[predicted_numeric_class] if isinstance(explainer.expected_value, (list, np.ndarray)) else explainer.expected_value,
-        shap_values_for_class,
-        data_row,
-        feature_names=feature_names
+def shap_chart_data(application_id, shap_values, feature_names, predicted_category_name):
+    """Inputs of the "shap" chart (chart_rendering) for the nonzero SHAP values, or None if all are zero"""
+    nonzero = [i for i, value in enumerate(shap_values) if value != 0]
+    if not nonzero:
+        return None
+    return dict(
+        shap_values=[float(shap_values[i]) for i in nonzero],
+        feature_names=[feature_names[i] for i in nonzero],
+        title=f"SHAP Explanation for Application {application_id}\n(Predicted: {predicted_category_name})"
     )
-    shap.save_html(force_filepath, shap_html)
-    print(f"SHAP force plot HTML saved to {force_filepath}")
-    
-    return shap_values_for_class, df
 
 FEATURE_TO_5C_MAP = {
     'Character': ['civil_status', 'dependents', 'years_of_stay', 'residence_type', 'employment_type', 'bpi_successful_loans', 'postpaid_plan_history'],
@@ -338,84 +414,80 @@ FEATURE_TO_5C_MAP = {
     'Conditions': ['address_city', 'address_province', 'loan_purpose', 'data_usage_patterns', 'prepaid_load_frequency']
 }
 
-def generate_aggregated_lime(df, application_id, lime_explanation, predicted_category, 
-                              FEATURE_TO_5C_MAP=FEATURE_TO_5C_MAP, 
-                              filename="lime_aggregated.png", outdir="outdir"):
+FIVE_C_CATEGORIES = list(FEATURE_TO_5C_MAP)
+
+@functools.lru_cache(maxsize=8)
+def _five_c_matrix(feature_names, five_c_items):
+    feature_category = {}
+    for col, (category, features) in enumerate(five_c_items):
+        for feature in features:
+            # A feature listed twice counts towards the first category, as the old per-feature lookup did
+            feature_category.setdefault(feature, col)
+    rows = [i for i, feature in enumerate(feature_names) if feature in feature_category]
+    cols = [feature_category[feature_names[i]] for i in rows]
+    return sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(feature_names), len(five_c_items)))
+
+def five_c_matrix(feature_names, FEATURE_TO_5C_MAP=FEATURE_TO_5C_MAP):
+    """
+    Sparse (features x 5C) 0/1 matrix: entry (i, c) is 1 when feature i belongs to category c.
+    Built once per feature list and mapping.
+    """
+    five_c_items = tuple((category, tuple(features)) for category, features in FEATURE_TO_5C_MAP.items())
+    return _five_c_matrix(tuple(feature_names), five_c_items)
+
+def lime_weight_matrix(lime_explanations, labels, n_features):
+    """Dense (explanations x features) LIME weights for each explanation's label, from local_exp indices"""
+    weights = np.zeros((len(lime_explanations), n_features))
+    for row, (lime_explanation, label) in enumerate(zip(lime_explanations, labels)):
+        feature_indices, feature_weights = zip(*lime_explanation.local_exp[label])
+        weights[row, list(feature_indices)] = feature_weights
+    return weights
+
+def aggregate_5c_scores(lime_explanations, labels, feature_names, FEATURE_TO_5C_MAP=FEATURE_TO_5C_MAP):
+    """
+    5C scores for a batch of LIME explanations in one sparse matrix multiply.
+    `labels` are the numeric classes explained; returns an (explanations x 5C) array
+    with columns in FEATURE_TO_5C_MAP order.
+    """
+    weights = lime_weight_matrix(lime_explanations, labels, len(feature_names))
+    return np.asarray(weights @ five_c_matrix(feature_names, FEATURE_TO_5C_MAP))
+
+def generate_aggregated_lime(application_id, lime_explanation, predicted_category, feature_names,
+                              FEATURE_TO_5C_MAP=FEATURE_TO_5C_MAP, records=None):
     """
     Aggregates LIME features into 5 Cs for a specific application_id and predicted category.
-    Adds 5C importance columns to df and saves a horizontal bar plot.
+    Draw the result with the render pool's "five_c" chart (chart_rendering.CHARTS).
     
     Parameters:
     -----------
-    df : pd.DataFrame
-        The dataframe containing application data.
     application_id : int or str
         The application ID to aggregate.
     lime_explanation : LIME explanation object
         LIME explanation returned by generate_lime_explanation.
     predicted_category : str
         Name of the predicted risk category (e.g., "Loss").
+    feature_names : list
+        Feature names in the order the LIME explainer was built with (X_train.columns).
     FEATURE_TO_5C_MAP : dict
         Mapping from 5C categories to feature names.
-    filename : str
-        Filename for the saved plot.
-    outdir : str
-        Directory to save the plot.
+    records : ExplanationRecords, optional
+        Receives the 5C scores as records of kind FIVE_C.
         
     Returns:
     --------
     aggregated_scores : dict
         Dictionary of aggregated 5C scores.
-    df : pd.DataFrame
-        Updated dataframe with new importance columns.
     """
-    if outdir:
-        os.makedirs(outdir, exist_ok=True)
-        filepath = os.path.join(outdir, filename)
-    else:
-        filepath = filename
-
-    aggregated_scores = {c: 0 for c in FEATURE_TO_5C_MAP.keys()}
-
     # --- Map predicted_category back to numeric label for LIME ---
     predicted_numeric_class = [k for k, v in RISK_CATEGORY_MAP.items() if v == predicted_category][0]
 
-    # --- Extract LIME list for the predicted class only ---
-    lime_list = lime_explanation.as_list(label=predicted_numeric_class)
-    cleaned_features = [name.split(' ')[0] for name, _ in lime_list]
-    weights = [weight for _, weight in lime_list]
-
-    # --- Aggregate scores into 5C ---
-    for feature_name, weight in zip(cleaned_features, weights):
-        for category, features in FEATURE_TO_5C_MAP.items():
-            if feature_name in features:
-                aggregated_scores[category] += weight
-                break
-
-    # --- Add importance columns to df ---
-    row_mask = df['application_id'] == application_id
-    if not row_mask.any():
-        raise ValueError(f"Application ID {application_id} not found in df")
-    for category, score in aggregated_scores.items():
-        col_name = f"{category}_importance_for_{predicted_category}"
-        if col_name not in df.columns:
-            df[col_name] = np.nan
-        df.loc[row_mask, col_name] = float(score) 
-
-    # --- Plot ---
-    sorted_scores = sorted(aggregated_scores.items(), key=lambda item: item[1])
-    categories = [item[0] for item in sorted_scores]
-    scores = [item[1] for item in sorted_scores]
-    colors = ['red' if s < 0 else 'green' for s in scores]
-
-    plt.figure(figsize=(10, 7))
-    plt.barh(categories, scores, color=colors)
-    plt.xlabel('Negative Impact <--- | ---> Positive Impact')
-    plt.title(f'Key Factors for Your "{predicted_category}" Rating')
-    plt.axvline(x=0, color='grey', linestyle='--')
-    plt.tight_layout()
-    plt.savefig(filepath)
-    plt.close()
-    print(f"Aggregated LIME plot saved to {filepath}")
+    scores = aggregate_5c_scores([lime_explanation], [predicted_numeric_class], list(feature_names),
+                                 FEATURE_TO_5C_MAP)[0]
+    aggregated_scores = dict(zip(FEATURE_TO_5C_MAP, scores.tolist()))
+
+    # --- Record 5C scores ---
+    if records is not None:
+        records.add(FIVE_C, application_id, predicted_numeric_class,
+                    list(aggregated_scores), list(aggregated_scores.values()))
 
-    return aggregated_scores, df
+    return aggregated_scores
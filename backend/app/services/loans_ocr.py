@@ -1,5 +1,6 @@
 import os
 import re
+import asyncio
 import zipfile
 import tempfile
 from difflib import SequenceMatcher
@@ -8,13 +9,21 @@ import numpy as np
 from dotenv import load_dotenv
 from sqlalchemy.orm import Session
 from .. import models
-import google.generativeai as genai
+from .llm_client import get_llm_client
+from .llm_providers import get_model
 
 load_dotenv()
 
-# Configure Gemini
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-model = genai.GenerativeModel("gemini-2.0-flash")
+# Model of the configured LLM provider that reads ID and payslip images
+MODEL_NAME = "gemini-2.0-flash"
+
+# Rows read from the uploaded CSV at a time, so memory does not grow with the file size
+CSV_CHUNK_SIZE = int(os.getenv("SCORING_CHUNK_SIZE", "10000"))
+# Applications whose documents are read at once; the LLM client also caps the Gemini calls
+OCR_CONCURRENCY = int(os.getenv("OCR_CONCURRENCY", "8"))
+# Applications whose IDs and document details are returned in the upload response; the
+# counts always cover the whole file
+OCR_DETAILS_LIMIT = int(os.getenv("OCR_DETAILS_LIMIT", "1000"))
 
 
 def clean_dict_for_json(data):
@@ -67,13 +76,11 @@ def analyze_id(file_path: str):
         }
 
         # Prompt Gemini to extract names from ID
-        response = model.generate_content([
+        text_output = get_llm_client().generate(get_model(MODEL_NAME), [
             "Extract all possible names from this ID document. Return as a JSON list of names only. "
             "Focus on the main name fields and ignore headers, labels, or administrative text.",
             image_blob
-        ])
-
-        text_output = response.text.strip()
+        ], route="ocr").strip()
 
         # Try to parse as JSON first
         try:
@@ -125,14 +132,12 @@ def analyze_payslip(image_path: str):
         }
 
         # Ask Gemini to extract structured payslip information
-        response = model.generate_content([
+        text_output = get_llm_client().generate(get_model(MODEL_NAME), [
             "Extract key payslip information from this image. Return JSON with fields: "
             "Employer, Employee Name, Gross Pay, Deductions, Net Pay. "
             "Focus on numerical values for pay amounts.",
             image_blob
-        ])
-
-        text_output = response.text.strip()
+        ], route="ocr").strip()
 
         # Try to parse as JSON first
         try:
@@ -346,9 +351,9 @@ async def process_files(csv_path: str, zip_path: str, session_id: str, db: Sessi
         dict: Analysis results with validation statistics and details
     """
     try:
-        # Load application data
-        df = pd.read_csv(csv_path)
-        print(f"📊 Loaded CSV with {len(df)} records")
+        total_applications = 0
+        valid_count = 0
+        rejected_count = 0
 
         # Process documents in temporary directory
         with tempfile.TemporaryDirectory() as temp_dir:
@@ -356,63 +361,83 @@ async def process_files(csv_path: str, zip_path: str, session_id: str, db: Sessi
             with zipfile.ZipFile(zip_path, 'r') as zip_ref:
                 zip_ref.extractall(temp_dir)
             
+            # IDs and details of the first OCR_DETAILS_LIMIT applications only
             valid_applications = []
             rejected_applications = []
-            processed_results = []
             detailed_results = {}
 
-            # Process each application
-            for _, row in df.iterrows():
-                application_id = row["application_id"]
-                
-                success, result = process_single_application(df, application_id, temp_dir)
-                
-                if result:
-                    processed_results.append(result)
-                    detailed_results[application_id] = result
-                
-                # Apply validation criteria: must have ID and payslip documents with valid ID
-                is_valid_application = (
-                    result and 
-                    result.get('found_id', False) and 
-                    result.get('found_payslip', False) and 
-                    result.get('valid_id', False)
-                )
-
-                if is_valid_application:
-                    # Prepare data for database storage
-                    row_dict = row.to_dict()
-                    row_dict = clean_dict_for_json(row_dict)
-                    
-                    # Add net pay if available
-                    if result and "net_pay" in result:
-                        row_dict["net_pay"] = result["net_pay"]
-                    
-                    # Store in database
-                    dashboard_row = models.DashboardData(
-                        session_id=session_id,
-                        row_data=row_dict
-                    )
-                    db.add(dashboard_row)
-                    valid_applications.append(application_id)
-                else:
-                    rejected_applications.append(application_id)
-
-            # Commit database changes
-            db.commit()
+            # Process each application, reading the CSV one chunk at a time
+            for df in pd.read_csv(csv_path, chunksize=CSV_CHUNK_SIZE):
+                total_applications += len(df)
+                dashboard_rows = []
+                # OCR OCR_CONCURRENCY applications at a time off the event loop
+                for start in range(0, len(df), OCR_CONCURRENCY):
+                    batch = df.iloc[start:start + OCR_CONCURRENCY]
+                    outcomes = await asyncio.gather(*(
+                        asyncio.to_thread(process_single_application, df, application_id, temp_dir)
+                        for application_id in batch["application_id"]
+                    ))
+                    for (_, row), (success, result) in zip(batch.iterrows(), outcomes):
+                        application_id = row["application_id"]
+                        keep_details = valid_count + rejected_count < OCR_DETAILS_LIMIT
+
+                        if result and keep_details:
+                            detailed_results[application_id] = result
+
+                        # Apply validation criteria: must have ID and payslip documents with valid ID
+                        is_valid_application = (
+                            result and 
+                            result.get('found_id', False) and 
+                            result.get('found_payslip', False) and 
+                            result.get('valid_id', False)
+                        )
+
+                        if is_valid_application:
+                            # Prepare data for database storage
+                            row_dict = row.to_dict()
+                            row_dict = clean_dict_for_json(row_dict)
+
+                            # Add net pay if available
+                            if result and "net_pay" in result:
+                                row_dict["net_pay"] = result["net_pay"]
+
+                            # Store in database
+                            dashboard_row = models.DashboardData(
+                                session_id=session_id,
+                                row_data=row_dict
+                            )
+                            db.add(dashboard_row)
+                            dashboard_rows.append(dashboard_row)
+                            valid_count += 1
+                            if keep_details:
+                                valid_applications.append(application_id)
+                        else:
+                            rejected_count += 1
+                            if keep_details:
+                                rejected_applications.append(application_id)
+
+                # Commit each chunk and drop its rows from the session so memory stays flat
+                db.commit()
+                for dashboard_row in dashboard_rows:
+                    db.expunge(dashboard_row)
+
+            print(f"📊 Processed CSV with {total_applications} records")
 
             # Generate analysis summary
             analysis_results = {
-                "total_applications": len(df),
-                "validation_rate": len(valid_applications) / len(df) * 100 if len(df) > 0 else 0,
+                "total_applications": total_applications,
+                "valid_applications": valid_count,
+                "rejected_applications": rejected_count,
+                "validation_rate": valid_count / total_applications * 100 if total_applications > 0 else 0,
                 "valid_app_ids": valid_applications,
                 "rejected_app_ids": rejected_applications,
-                "per_application_details": detailed_results
+                "per_application_details": detailed_results,
+                "details_truncated": total_applications > OCR_DETAILS_LIMIT
             }
 
             print(f"\n📌 Analysis Summary:")
-            print(f"✅ Valid applications: {len(valid_applications)}")
-            print(f"❌ Rejected applications: {len(rejected_applications)}")
+            print(f"✅ Valid applications: {valid_count}")
+            print(f"❌ Rejected applications: {rejected_count}")
             print(f"📈 Validation rate: {analysis_results['validation_rate']:.1f}%")
 
             return analysis_results
@@ -420,4 +445,7 @@ async def process_files(csv_path: str, zip_path: str, session_id: str, db: Sessi
     except Exception as e:
         print(f"Error processing files: {str(e)}")
         db.rollback()
+        # Chunks are committed as they go, so remove the rows of a failed upload
+        db.query(models.DashboardData).filter(models.DashboardData.session_id == session_id).delete()
+        db.commit()
         raise e
\ No newline at end of file
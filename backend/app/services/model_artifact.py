@@ -0,0 +1,263 @@
+import os
+import json
+import argparse
+import threading
+from datetime import datetime, timezone
+
+import joblib
+import pandas as pd
+import shap
+
+from .loan_screening import (
+    load_and_preprocess_data,
+    features_train_test_split,
+    train_ordinal_gbm,
+    build_lime_explainer)
+from .feature_pipeline import FeatureTransform
+from .fast_predict import CompiledForest, check_parity
+from .data_io import read_applications
+
+# Bump whenever the bundle layout changes so stale artifacts are rejected instead of misread
+ARTIFACT_FORMAT_VERSION = 3
+
+DEFAULT_ARTIFACT_DIR = os.getenv("MODEL_ARTIFACT_DIR", "backend/models")
+DEFAULT_TRAIN_CSV_PATH = os.getenv("TRAIN_CSV_PATH", "backend/sample_data/apps_synthetic_data.csv")
+
+MANIFEST_FILENAME = "manifest.json"
+BUNDLE_FILENAME = "bundle.joblib"
+LATEST_FILENAME = "LATEST"
+# Metadata keys holding application ID lists
+APPLICATION_ID_KEYS = ("seen_application_ids", "test_application_ids")
+
+
+class ModelArtifact:
+    """Everything inference needs from one training run, restorable without retraining"""
+
+    def __init__(self, version, model, transform, X_train, metadata=None):
+        self.version = version
+        self.model = model
+        self.transform = transform
+        self.feature_columns = transform.feature_columns
+        # Array form of the trees for low-latency single-application scoring
+        self.compiled = CompiledForest.from_model(model)
+        self.X_train = X_train
+        self.metadata = metadata or {}
+        self._derived = {}
+        self._lazy_lock = threading.Lock()
+        self._frozen = False
+
+    def freeze(self):
+        """Make the artifact read-only once it is shared between requests"""
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, "_frozen", False):
+            raise AttributeError(f"ModelArtifact {self.version} is read-only; train a new version instead")
+        super().__setattr__(name, value)
+
+    def _derived_state(self, name, build):
+        """
+        Build derived, read-only state (explainers) on first use and share it with every
+        request and thread using this artifact. The dict is filled in after freezing;
+        the model itself stays read-only.
+        """
+        value = self._derived.get(name)
+        if value is None:
+            with self._lazy_lock:
+                value = self._derived.get(name)
+                if value is None:
+                    value = self._derived[name] = build()
+        return value
+
+    @property
+    def lime_explainer(self):
+        """LIME explainer over X_train with a perturbation bank pre-scored by this model"""
+        return self._derived_state(
+            "lime_explainer", lambda: build_lime_explainer(self.X_train, predict_fn=self.model.predict_proba))
+
+    @property
+    def shap_explainer(self):
+        """TreeSHAP explainer for this model; parsing the trees is the expensive part"""
+        return self._derived_state("shap_explainer", lambda: shap.TreeExplainer(self.model))
+
+    def manifest(self):
+        """Human-readable description of the artifact, written next to the bundle"""
+        return {
+            "format_version": ARTIFACT_FORMAT_VERSION,
+            "version": self.version,
+            **self.transform.describe(),
+            "X_train_rows": int(len(self.X_train)),
+            **{
+                # Application ID lists are summarized by their size; the bundle keeps them in full
+                key: len(value) if key in APPLICATION_ID_KEYS else value
+                for key, value in self.metadata.items()
+            },
+        }
+
+
+def new_version():
+    """Sortable, filesystem-safe version tag based on the current UTC time"""
+    return datetime.now(timezone.utc).strftime("v%Y%m%dT%H%M%S")
+
+
+def load_training_data(train_csv_path=DEFAULT_TRAIN_CSV_PATH):
+    """Fit the feature transform on a training file and return (transform, X, y)"""
+    raw_df = read_applications(train_csv_path)
+
+    # Labels still come from the risk-index rule; features come from the frozen transform
+    labelled_df = load_and_preprocess_data(df=raw_df)
+    transform = FeatureTransform().fit(raw_df)
+    X = transform.transform(raw_df)
+    y = pd.Series(labelled_df['risk_category'].to_numpy(), index=X.index, name='risk_category')
+    return transform, X, y
+
+
+def train_model_artifact(train_csv_path=DEFAULT_TRAIN_CSV_PATH, version=None, params=None):
+    """
+    Train the risk model once and capture the fitted state needed to serve it.
+    `params` override the default LightGBM parameters (see model_tuning).
+    """
+    transform, X, y = load_training_data(train_csv_path)
+
+    X_train, X_test, y_train, y_test = features_train_test_split(X, y)
+    model = train_ordinal_gbm(X_train, y_train, params=params)
+
+    artifact = ModelArtifact(
+        version=version or new_version(),
+        model=model,
+        transform=transform,
+        X_train=X_train,
+        metadata={
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "train_csv_path": train_csv_path,
+            "params": params or {},
+            "test_accuracy": float((model.predict(X_test) == y_test.values).mean()),
+            # Refreshes never fit on rows the model has seen, and always evaluate on the same test rows
+            "seen_application_ids": sorted(X.index),
+            "test_application_ids": sorted(X_test.index),
+        }
+    )
+    # Refuse to ship a model whose compiled form disagrees with LightGBM
+    artifact.metadata["compiled_parity"] = check_parity(artifact.compiled, model, X_test)
+    return artifact
+
+
+def save_model_artifact(artifact, artifact_dir=DEFAULT_ARTIFACT_DIR, make_latest=True):
+    """Write the artifact to <artifact_dir>/<version>/ and optionally point LATEST at it"""
+    version_dir = os.path.join(artifact_dir, artifact.version)
+    os.makedirs(version_dir, exist_ok=True)
+
+    bundle = {
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "version": artifact.version,
+        "model": artifact.model,
+        "transform": artifact.transform,
+        "X_train": artifact.X_train,
+        "metadata": artifact.metadata,
+    }
+    joblib.dump(bundle, os.path.join(version_dir, BUNDLE_FILENAME))
+    with open(os.path.join(version_dir, MANIFEST_FILENAME), "w") as f:
+        json.dump(artifact.manifest(), f, indent=2)
+
+    if make_latest:
+        # Write-then-rename so readers never see a half-written pointer
+        latest_path = os.path.join(artifact_dir, LATEST_FILENAME)
+        tmp_path = latest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(artifact.version)
+        os.replace(tmp_path, latest_path)
+
+    print(f"Model artifact {artifact.version} saved to {version_dir}")
+    return version_dir
+
+
+def latest_version(artifact_dir=DEFAULT_ARTIFACT_DIR):
+    """Return the version LATEST points at, or None if nothing has been saved yet"""
+    latest_path = os.path.join(artifact_dir, LATEST_FILENAME)
+    if not os.path.exists(latest_path):
+        return None
+    with open(latest_path) as f:
+        return f.read().strip() or None
+
+
+def list_versions(artifact_dir=DEFAULT_ARTIFACT_DIR):
+    """All saved versions, oldest first"""
+    if not os.path.isdir(artifact_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(artifact_dir)
+        if os.path.exists(os.path.join(artifact_dir, name, BUNDLE_FILENAME))
+    )
+
+
+def load_model_artifact(version=None, artifact_dir=DEFAULT_ARTIFACT_DIR):
+    """Restore a saved artifact; defaults to the LATEST version"""
+    version = version or latest_version(artifact_dir)
+    if not version:
+        raise FileNotFoundError(f"No model artifact found in {artifact_dir}")
+
+    bundle_path = os.path.join(artifact_dir, version, BUNDLE_FILENAME)
+    if not os.path.exists(bundle_path):
+        raise FileNotFoundError(f"Model artifact {version} not found at {bundle_path}")
+
+    bundle = joblib.load(bundle_path)
+    if bundle.get("format_version") != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(
+            f"Model artifact {version} has format version {bundle.get('format_version')}, "
+            f"expected {ARTIFACT_FORMAT_VERSION}. Retrain with `python -m backend.app.services.model_artifact train`."
+        )
+
+    return ModelArtifact(
+        version=bundle["version"],
+        model=bundle["model"],
+        transform=bundle["transform"],
+        X_train=bundle["X_train"],
+        metadata=bundle["metadata"],
+    )
+
+
+def load_or_train_model_artifact(train_csv_path=DEFAULT_TRAIN_CSV_PATH, artifact_dir=DEFAULT_ARTIFACT_DIR):
+    """Load the LATEST artifact, training and saving one first if none exists"""
+    try:
+        return load_model_artifact(artifact_dir=artifact_dir)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"{e} - training a new model artifact from {train_csv_path}")
+        artifact = train_model_artifact(train_csv_path)
+        save_model_artifact(artifact, artifact_dir)
+        return artifact
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and inspect persisted loan risk model artifacts")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = subparsers.add_parser("train", help="Train the model and write a new artifact version")
+    train_parser.add_argument("--train-csv", default=DEFAULT_TRAIN_CSV_PATH)
+    train_parser.add_argument("--artifact-dir", default=DEFAULT_ARTIFACT_DIR)
+    train_parser.add_argument("--version", default=None)
+    train_parser.add_argument("--no-latest", action="store_true", help="Do not point LATEST at the new version")
+    train_parser.add_argument("--params", default=None,
+                              help="JSON file of LightGBM parameter overrides, e.g. a model_tuning metrics.json")
+
+    info_parser = subparsers.add_parser("info", help="Print the manifest of a saved artifact")
+    info_parser.add_argument("--artifact-dir", default=DEFAULT_ARTIFACT_DIR)
+    info_parser.add_argument("--version", default=None)
+
+    args = parser.parse_args()
+
+    if args.command == "train":
+        params = None
+        if args.params:
+            with open(args.params) as f:
+                params = json.load(f)
+            # Accept either a bare parameter dict or a tuning metrics file
+            params = params.get("params", params)
+        artifact = train_model_artifact(args.train_csv, version=args.version, params=params)
+        save_model_artifact(artifact, args.artifact_dir, make_latest=not args.no_latest)
+    elif args.command == "info":
+        artifact = load_model_artifact(args.version, args.artifact_dir)
+        print(json.dumps(artifact.manifest(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
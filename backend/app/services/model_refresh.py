@@ -0,0 +1,215 @@
+import os
+import json
+import argparse
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+from .loan_screening import (
+    load_and_preprocess_data,
+    features_train_test_split,
+    continue_ordinal_gbm,
+    RISK_CATEGORY_MAP)
+from .model_artifact import (
+    ModelArtifact,
+    new_version,
+    load_model_artifact,
+    save_model_artifact,
+    DEFAULT_ARTIFACT_DIR)
+from .fast_predict import check_parity
+from .data_io import read_applications
+
+# Boosting rounds added per refresh; a full training run uses ORDINAL_GBM_PARAMS['n_estimators']
+DEFAULT_REFRESH_ROUNDS = int(os.getenv("REFRESH_ROUNDS", "25"))
+# Fewer new rows than this are left for the next refresh
+MIN_REFRESH_ROWS = int(os.getenv("MIN_REFRESH_ROWS", "200"))
+# Share of the new rows held back to compare the previous and refreshed versions
+REFRESH_HOLDOUT = 0.2
+
+DIFF_FILENAME = "refresh_diff.json"
+
+# Columns the scoring pipeline adds to DashboardData rows; they are outputs, not inputs
+SCORED_COLUMNS = ['risk_category', 'probabilities']
+
+
+def load_scored_rows(db, after_id=0):
+    """
+    Application rows stored by scored sessions (DashboardData) with id > after_id.
+    Returns (raw_df, last_id); last_id is the watermark for the next refresh.
+    """
+    from .. import models
+
+    rows = (
+        db.query(models.DashboardData.id, models.DashboardData.row_data)
+        .filter(models.DashboardData.id > after_id)
+        .order_by(models.DashboardData.id)
+        .all()
+    )
+    if not rows:
+        return pd.DataFrame(), after_id
+
+    raw_df = pd.DataFrame([row.row_data for row in rows])
+    raw_df = raw_df.drop(columns=[col for col in SCORED_COLUMNS if col in raw_df.columns])
+    return raw_df, rows[-1].id
+
+
+def label_new_rows(reference_raw, new_raw):
+    """
+    Risk-category labels for new rows under the same risk-index rule as training.
+    The rule scales and bins relative to the population, so the new rows are scored
+    together with the original training rows rather than on their own.
+    """
+    columns = [col for col in reference_raw.columns if col in new_raw.columns]
+    combined = pd.concat([reference_raw[columns], new_raw[columns]], ignore_index=True)
+    labels = load_and_preprocess_data(df=combined)['risk_category'].to_numpy()
+    return labels[len(reference_raw):]
+
+
+def _accuracy(model, X, y):
+    return float((model.predict(X) == np.asarray(y)).mean())
+
+
+def evaluation_diff(previous, refreshed, evaluation_sets):
+    """Accuracy of both versions on each evaluation set, plus how often they agree"""
+    diff = {"previous_version": previous.version, "refreshed_version": refreshed.version, "sets": {}}
+    for name, (X, y) in evaluation_sets.items():
+        previous_pred = previous.model.predict(X)
+        refreshed_pred = refreshed.model.predict(X)
+        previous_accuracy = float((previous_pred == np.asarray(y)).mean())
+        refreshed_accuracy = float((refreshed_pred == np.asarray(y)).mean())
+        diff["sets"][name] = {
+            "rows": int(len(X)),
+            "previous_accuracy": previous_accuracy,
+            "refreshed_accuracy": refreshed_accuracy,
+            "accuracy_delta": refreshed_accuracy - previous_accuracy,
+            "prediction_agreement": float((previous_pred == refreshed_pred).mean()),
+            "refreshed_category_counts": {
+                RISK_CATEGORY_MAP[int(k)]: int(v) for k, v in zip(*np.unique(refreshed_pred, return_counts=True))
+            },
+        }
+    return diff
+
+
+def training_test_split(base, reference_X, reference_y):
+    """
+    The base model's held-out training rows (X_test, y_test). Artifacts saved before
+    their test IDs were recorded get the split recomputed the way training made it.
+    """
+    test_ids = base.metadata.get("test_application_ids")
+    if test_ids is None:
+        _, X_test, _, y_test = features_train_test_split(reference_X, reference_y)
+        return X_test, y_test
+    test_mask = reference_X.index.isin(test_ids)
+    return reference_X[test_mask], reference_y[test_mask]
+
+
+def refresh_model_artifact(base, new_raw, n_rounds=DEFAULT_REFRESH_ROUNDS, watermark=None):
+    """
+    Continue boosting `base` on rows it has never trained or been evaluated on. The
+    frozen transform, LIME background (X_train) and parameters are inherited; only the
+    booster grows.
+    Returns (refreshed_artifact, evaluation_diff).
+    """
+    train_csv_path = base.metadata["train_csv_path"]
+    reference_raw = read_applications(train_csv_path)
+    reference_X = base.transform.transform(reference_raw)
+    reference_y = load_and_preprocess_data(df=reference_raw)['risk_category'].to_numpy()
+    X_test, y_test = training_test_split(base, reference_X, reference_y)
+
+    # Rows the base trained or was evaluated on (including earlier refreshes) are not new;
+    # the training test split in particular must never be fit on, or the gate below scores itself
+    seen_ids = set(base.metadata.get("seen_application_ids") or reference_X.index) | set(X_test.index)
+    new_raw = new_raw[~new_raw['application_id'].isin(seen_ids)].drop_duplicates('application_id')
+    if len(new_raw) < MIN_REFRESH_ROWS:
+        raise ValueError(f"Only {len(new_raw)} new application rows; at least {MIN_REFRESH_ROWS} are needed to refresh")
+
+    X_new = base.transform.transform(new_raw)
+    y_new = label_new_rows(reference_raw, new_raw)
+    X_fit, X_holdout, y_fit, y_holdout = train_test_split(X_new, y_new, test_size=REFRESH_HOLDOUT, random_state=42)
+
+    # The classifier's class count has to match the base booster's
+    missing = sorted(set(RISK_CATEGORY_MAP) - set(np.unique(y_fit)))
+    if missing:
+        raise ValueError(f"New rows contain no {[RISK_CATEGORY_MAP[c] for c in missing]} applications; "
+                         "wait for more data before refreshing")
+
+    params = base.metadata.get("params", {})
+    model = continue_ordinal_gbm(base.model, X_fit, y_fit, n_rounds, params=params)
+
+    refreshed = ModelArtifact(
+        version=new_version(),
+        model=model,
+        transform=base.transform,
+        X_train=base.X_train,
+        metadata={
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "train_csv_path": train_csv_path,
+            "params": params,
+            "test_accuracy": _accuracy(model, X_test, y_test),
+            "seen_application_ids": sorted(seen_ids | set(new_raw['application_id'])),
+            "test_application_ids": sorted(X_test.index),
+            "parent_version": base.version,
+            "refresh": {
+                "rows": int(len(X_fit)),
+                "holdout_rows": int(len(X_holdout)),
+                "rounds": n_rounds,
+                "watermark": watermark if watermark is not None else base.metadata.get("refresh", {}).get("watermark"),
+            },
+        }
+    )
+    refreshed.metadata["compiled_parity"] = check_parity(refreshed.compiled, model, X_test)
+
+    diff = evaluation_diff(base, refreshed, {
+        "training_test_split": (X_test, y_test),
+        "new_rows_holdout": (X_holdout, y_holdout),
+    })
+    return refreshed, diff
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Continue boosting the current model on newly scored applications")
+    parser.add_argument("--input", default=None,
+                        help="Applications file to learn from; defaults to DashboardData rows added since the last refresh")
+    parser.add_argument("--base-version", default=None, help="Artifact to refresh (default: LATEST)")
+    parser.add_argument("--artifact-dir", default=DEFAULT_ARTIFACT_DIR)
+    parser.add_argument("--rounds", type=int, default=DEFAULT_REFRESH_ROUNDS)
+    parser.add_argument("--max-regression", type=float, default=0.01,
+                        help="Do not point LATEST at the refreshed version if test accuracy drops by more than this")
+    args = parser.parse_args()
+
+    base = load_model_artifact(args.base_version, args.artifact_dir)
+
+    watermark = None
+    if args.input:
+        new_raw = read_applications(args.input)
+    else:
+        from ..database import SessionLocal
+        after_id = (base.metadata.get("refresh", {}).get("watermark") or {}).get("dashboard_data_id", 0)
+        db = SessionLocal()
+        try:
+            new_raw, last_id = load_scored_rows(db, after_id)
+        finally:
+            db.close()
+        watermark = {"dashboard_data_id": last_id}
+
+    if new_raw.empty:
+        print(f"No new application rows since model {base.version}; nothing to refresh")
+        return
+
+    refreshed, diff = refresh_model_artifact(base, new_raw, args.rounds, watermark)
+
+    delta = diff["sets"]["training_test_split"]["accuracy_delta"]
+    make_latest = delta >= -args.max_regression
+    version_dir = save_model_artifact(refreshed, args.artifact_dir, make_latest=make_latest)
+    with open(os.path.join(version_dir, DIFF_FILENAME), "w") as f:
+        json.dump(diff, f, indent=2)
+
+    print(json.dumps(diff, indent=2))
+    if not make_latest:
+        print(f"Test accuracy dropped by {-delta:.4f}; {refreshed.version} saved but LATEST still points at {base.version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import threading
+
+from .model_artifact import (
+    load_model_artifact,
+    load_or_train_model_artifact,
+    list_versions,
+    DEFAULT_ARTIFACT_DIR,
+    DEFAULT_TRAIN_CSV_PATH)
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded model artifacts.
+
+    Each version is loaded at most once per worker process and every caller
+    receives the same frozen ModelArtifact. Swapping the active version only
+    rebinds a reference, so requests already holding the previous artifact
+    finish on it undisturbed.
+    """
+
+    def __init__(self, artifact_dir=DEFAULT_ARTIFACT_DIR, train_csv_path=DEFAULT_TRAIN_CSV_PATH, max_loaded=2):
+        self.artifact_dir = artifact_dir
+        self.train_csv_path = train_csv_path
+        self.max_loaded = max_loaded
+        self._lock = threading.Lock()
+        self._artifacts = {}
+        self._active_version = None
+
+    @property
+    def active_version(self):
+        return self._active_version
+
+    def loaded_versions(self):
+        return list(self._artifacts.keys())
+
+    def available_versions(self):
+        return list_versions(self.artifact_dir)
+
+    def _remember(self, artifact):
+        artifact.freeze()
+        self._artifacts[artifact.version] = artifact
+
+    def load(self, version):
+        """Return the artifact for `version`, reading it from disk only the first time"""
+        artifact = self._artifacts.get(version)
+        if artifact is not None:
+            return artifact
+
+        # Disk I/O happens outside the lock; a duplicate concurrent load is harmless
+        artifact = load_model_artifact(version, self.artifact_dir)
+        with self._lock:
+            if version not in self._artifacts:
+                self._remember(artifact)
+            return self._artifacts[version]
+
+    def activate(self, version=None):
+        """
+        Make `version` (default: LATEST on disk) the artifact handed out by get().
+        Falls back to training a new artifact if none has been saved yet.
+        """
+        if version is None:
+            artifact = load_or_train_model_artifact(self.train_csv_path, self.artifact_dir)
+            with self._lock:
+                if artifact.version not in self._artifacts:
+                    self._remember(artifact)
+                artifact = self._artifacts[artifact.version]
+        else:
+            artifact = self.load(version)
+
+        with self._lock:
+            self._active_version = artifact.version
+            self._evict_inactive()
+        print(f"Model version {artifact.version} is now active")
+        return artifact
+
+    def _evict_inactive(self):
+        # Keep the active version plus the most recent others for quick rollback.
+        # Evicted artifacts stay alive for as long as an in-flight request references them.
+        inactive = [v for v in self._artifacts if v != self._active_version]
+        while len(inactive) + 1 > self.max_loaded and inactive:
+            del self._artifacts[inactive.pop(0)]
+
+    def get(self, version=None):
+        """Return a read-only artifact: the requested version, else the active one"""
+        if version is not None:
+            return self.load(version)
+
+        version = self._active_version
+        if version is None:
+            return self.activate()
+        artifact = self._artifacts.get(version)
+        return artifact if artifact is not None else self.load(version)
+
+
+registry = ModelRegistry()
+
+
+def get_registry():
+    return registry
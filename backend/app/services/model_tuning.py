@@ -0,0 +1,207 @@
+import os
+import json
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import numpy as np
+from sklearn.model_selection import StratifiedKFold
+from sklearn.metrics import accuracy_score, f1_score, classification_report, confusion_matrix
+
+from .loan_screening import (
+    train_ordinal_gbm,
+    features_train_test_split,
+    plot_confusion_matrix,
+    RISK_CATEGORY_MAP,
+    ORDINAL_GBM_PARAMS)
+from .model_artifact import load_training_data, DEFAULT_TRAIN_CSV_PATH
+from .fast_predict import CompiledForest, feature_matrix
+
+DEFAULT_TUNING_DIR = os.getenv("TUNING_OUTPUT_DIR", "outdir/tuning")
+
+# Grid searched by default; every combination is one candidate
+DEFAULT_SEARCH_SPACE = {
+    'n_estimators': [100, 150, 300],
+    'learning_rate': [0.05, 0.1],
+    'num_leaves': [15, 31],
+    'min_data_per_group': [50, 100],
+}
+
+TARGET_NAMES = [RISK_CATEGORY_MAP[k] for k in sorted(RISK_CATEGORY_MAP)]
+
+# Rows of the validation fold timed through the compiled single-row predictor
+LATENCY_SAMPLE_ROWS = 50
+
+# Set once per worker process by _init_worker so the data is not re-sent with every task
+_worker_data = {}
+
+
+def candidate_grid(search_space=DEFAULT_SEARCH_SPACE):
+    """Expand a {param: [values]} search space into a list of parameter dicts"""
+    keys = list(search_space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(search_space[k] for k in keys))]
+
+
+def candidate_id(params):
+    return "_".join(f"{key}-{value}" for key, value in sorted(params.items()))
+
+
+def _init_worker(X, y):
+    _worker_data["X"] = X
+    _worker_data["y"] = y
+
+
+def _single_row_latency_us(model, X_valid):
+    """Median compiled single-row prediction time, the path the API serves"""
+    forest = CompiledForest.from_model(model)
+    rows = feature_matrix(X_valid.iloc[:LATENCY_SAMPLE_ROWS], forest.feature_names)
+    timings = []
+    for row in rows:
+        start = time.perf_counter()
+        forest.predict_row(row)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1e6)
+
+
+def evaluate_candidate(params, n_folds, n_jobs, output_dir):
+    """
+    k-fold cross-validate one parameter set in the calling worker process.
+    Writes <output_dir>/<candidate_id>/metrics.json and confusion_matrix.png
+    and returns the metrics dict.
+    """
+    X, y = _worker_data["X"], _worker_data["y"]
+    folds = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=42)
+
+    fold_metrics = []
+    out_of_fold = np.empty(len(y), dtype=y.dtype)
+    for train_index, valid_index in folds.split(X, y):
+        X_fold, y_fold = X.iloc[train_index], y.iloc[train_index]
+        X_valid, y_valid = X.iloc[valid_index], y.iloc[valid_index]
+
+        start = time.perf_counter()
+        # n_jobs caps LightGBM's threads so parallel workers do not oversubscribe the cores
+        model = train_ordinal_gbm(X_fold, y_fold, params={**params, 'n_jobs': n_jobs, 'verbose': -1}, verbose=False)
+        fit_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        probabilities = model.predict_proba(X_valid)
+        predict_seconds = time.perf_counter() - start
+        y_pred = model.classes_[probabilities.argmax(axis=1)]
+        out_of_fold[valid_index] = y_pred
+
+        fold_metrics.append({
+            "accuracy": float(accuracy_score(y_valid, y_pred)),
+            "macro_f1": float(f1_score(y_valid, y_pred, average='macro')),
+            "fit_seconds": fit_seconds,
+            "batch_predict_ms_per_1k_rows": predict_seconds / len(valid_index) * 1e6,
+            "single_row_predict_us": _single_row_latency_us(model, X_valid),
+        })
+
+    def mean(key):
+        return float(np.mean([fold[key] for fold in fold_metrics]))
+
+    cid = candidate_id(params)
+    candidate_dir = os.path.join(output_dir, cid)
+    os.makedirs(candidate_dir, exist_ok=True)
+
+    cm = confusion_matrix(y, out_of_fold, labels=sorted(RISK_CATEGORY_MAP))
+    plot_confusion_matrix(cm, TARGET_NAMES, os.path.join(candidate_dir, "confusion_matrix.png"))
+
+    metrics = {
+        "candidate_id": cid,
+        "params": params,
+        "n_folds": n_folds,
+        "accuracy_mean": mean("accuracy"),
+        "accuracy_std": float(np.std([fold["accuracy"] for fold in fold_metrics])),
+        "macro_f1_mean": mean("macro_f1"),
+        "fit_seconds_mean": mean("fit_seconds"),
+        "batch_predict_ms_per_1k_rows": mean("batch_predict_ms_per_1k_rows"),
+        "single_row_predict_us": mean("single_row_predict_us"),
+        "lightgbm_threads": n_jobs,
+        "folds": fold_metrics,
+        "confusion_matrix": cm.tolist(),
+        "classification_report": classification_report(
+            y, out_of_fold, labels=sorted(RISK_CATEGORY_MAP), target_names=TARGET_NAMES, output_dict=True, zero_division=0
+        ),
+    }
+    with open(os.path.join(candidate_dir, "metrics.json"), "w") as f:
+        json.dump(metrics, f, indent=2)
+    return metrics
+
+
+def run_search(train_csv_path=DEFAULT_TRAIN_CSV_PATH, candidates=None, n_folds=5,
+               workers=None, threads_per_worker=1, output_dir=None):
+    """
+    Cross-validate every candidate across a process pool, `workers` candidates at a
+    time with `threads_per_worker` LightGBM threads each. Only the training split is
+    used, so the held-out test split of train_model_artifact stays unseen.
+    Returns the per-candidate metrics sorted by mean accuracy.
+    """
+    candidates = candidates or candidate_grid()
+    workers = workers or max(1, (os.cpu_count() or 1) // threads_per_worker)
+    output_dir = output_dir or os.path.join(
+        DEFAULT_TUNING_DIR, datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S"))
+    os.makedirs(output_dir, exist_ok=True)
+
+    _, X, y = load_training_data(train_csv_path)
+    X_train, _, y_train, _ = features_train_test_split(X, y)
+
+    print(f"Evaluating {len(candidates)} candidates with {n_folds}-fold CV on {len(X_train)} rows "
+          f"({workers} workers x {threads_per_worker} LightGBM threads)")
+
+    results = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(X_train, y_train)) as pool:
+        futures = {
+            pool.submit(evaluate_candidate, params, n_folds, threads_per_worker, output_dir): params
+            for params in candidates
+        }
+        for future in as_completed(futures):
+            metrics = future.result()
+            results.append(metrics)
+            print(f"  {metrics['candidate_id']}: accuracy {metrics['accuracy_mean']:.4f}, "
+                  f"fit {metrics['fit_seconds_mean']:.2f}s, single row {metrics['single_row_predict_us']:.0f} us")
+
+    results.sort(key=lambda m: m["accuracy_mean"], reverse=True)
+    summary = {
+        "train_csv_path": train_csv_path,
+        "n_folds": n_folds,
+        "baseline_params": {k: v for k, v in ORDINAL_GBM_PARAMS.items() if k not in ('objective', 'num_class')},
+        "wall_clock_seconds": time.perf_counter() - start,
+        "candidates": [
+            {key: m[key] for key in ("candidate_id", "params", "accuracy_mean", "accuracy_std", "macro_f1_mean",
+                                     "fit_seconds_mean", "batch_predict_ms_per_1k_rows", "single_row_predict_us")}
+            for m in results
+        ],
+    }
+    with open(os.path.join(output_dir, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"Tuning results written to {output_dir}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-validated hyperparameter search for the loan risk model")
+    parser.add_argument("--train-csv", default=DEFAULT_TRAIN_CSV_PATH)
+    parser.add_argument("--search-space", default=None, help="JSON file mapping parameter names to lists of values")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None, help="Candidates evaluated in parallel (default: cores / threads)")
+    parser.add_argument("--threads", type=int, default=1, help="LightGBM threads per worker")
+    parser.add_argument("--output-dir", default=None)
+    args = parser.parse_args()
+
+    search_space = DEFAULT_SEARCH_SPACE
+    if args.search_space:
+        with open(args.search_space) as f:
+            search_space = json.load(f)
+
+    results = run_search(args.train_csv, candidate_grid(search_space), args.folds,
+                         args.workers, args.threads, args.output_dir)
+    best = results[0]
+    print(f"Best: {best['candidate_id']} (accuracy {best['accuracy_mean']:.4f} +/- {best['accuracy_std']:.4f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import os
+import time
+import threading
+
+# Gemini calls per minute allowed to the explanation (report) route of each API process,
+# unless LLM_ROUTE_CALLS_PER_MINUTE says otherwise; 0 disables the limit
+LLM_CALLS_PER_MINUTE = float(os.getenv("LLM_CALLS_PER_MINUTE", "30"))
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket: `rate_per_minute` calls on average, with bursts of up to
+    `burst` calls after an idle period. acquire() blocks until a call is allowed.
+    """
+
+    def __init__(self, rate_per_minute, burst=None):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.burst = burst or max(1, int(rate_per_minute // 10))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _wait_seconds(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate_per_second)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate_per_second
+
+    def try_acquire(self):
+        """Take a call slot if one is free; returns 0, or the seconds until one will be"""
+        if self.rate_per_second <= 0:
+            return 0.0
+        with self._lock:
+            return self._wait_seconds()
+
+    def acquire(self, timeout=None):
+        """Wait for a call slot; returns False if none was free within `timeout` seconds"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
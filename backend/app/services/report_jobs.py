@@ -0,0 +1,264 @@
+import os
+import uuid
+import socket
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+
+from .. import models
+from ..database import SessionLocal
+from .loan_application import DetailedProcessor, REPORT_STAGES
+from .model_registry import get_registry
+from .analysis_store import populate_session_analyses
+
+# Report jobs run concurrently per API process
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+# Idle workers look for queued jobs at least this often (enqueue wakes them immediately)
+POLL_SECONDS = float(os.getenv("REPORT_POLL_SECONDS", "2"))
+# A running job whose worker has not reported progress for this long is requeued
+STALE_SECONDS = int(os.getenv("REPORT_STALE_SECONDS", "300"))
+# Running jobs refresh their heartbeat this often, independently of stage changes, so a
+# long LLM wait never looks stale; keep it well below STALE_SECONDS
+HEARTBEAT_SECONDS = float(os.getenv("REPORT_HEARTBEAT_SECONDS", "30"))
+# Runs per job before it is marked failed
+MAX_ATTEMPTS = int(os.getenv("REPORT_MAX_ATTEMPTS", "3"))
+
+ACTIVE_STATUSES = ("queued", "running")
+# Processors kept per (session, model version) so a session's jobs share one SHAP batch
+MAX_CACHED_PROCESSORS = 4
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def job_status(job):
+    """JSON view of a ReportJob row"""
+    return {
+        "job_id": job.id,
+        "application_id": job.application_id,
+        "model_version": job.model_version,
+        "status": job.status,
+        "stage": job.stage,
+        "progress": job.progress,
+        "attempts": job.attempts,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def enqueue_report(db, application_id, session_id, model_version=None):
+    """
+    Queue a report for an application under a model version (default: the active one).
+    An identical job that is still queued or running is returned instead of a new one.
+    """
+    model_version = model_version or get_registry().active_version
+    job = db.query(models.ReportJob).filter(
+        models.ReportJob.session_id == session_id,
+        models.ReportJob.application_id == application_id,
+        models.ReportJob.model_version == model_version,
+        models.ReportJob.status.in_(ACTIVE_STATUSES)
+    ).first()
+    if job is not None:
+        return job
+
+    job = models.ReportJob(id=uuid.uuid4().hex, session_id=session_id, application_id=application_id,
+                           model_version=model_version, status="queued", stage="queued", progress=0.0, attempts=0)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    report_queue.notify()
+    return job
+
+
+def requeue_stale_jobs(db, stale_seconds=STALE_SECONDS):
+    """
+    Put running jobs whose worker stopped reporting (e.g. the process restarted) back in
+    the queue. Jobs that already used MAX_ATTEMPTS runs are marked failed instead, so a
+    job that keeps killing its process is not retried forever.
+    """
+    now = _now()
+    cutoff = now - timedelta(seconds=stale_seconds)
+    stale = db.query(models.ReportJob).filter(
+        models.ReportJob.status == "running",
+        models.ReportJob.heartbeat_at < cutoff
+    )
+    stale.filter(models.ReportJob.attempts >= MAX_ATTEMPTS).update(
+        {"status": "failed", "finished_at": now, "worker_id": None,
+         "error": f"Worker stopped responding; gave up after {MAX_ATTEMPTS} attempts"},
+        synchronize_session=False)
+    requeued = stale.filter(models.ReportJob.attempts < MAX_ATTEMPTS).update(
+        {"status": "queued", "stage": "queued", "progress": 0.0, "worker_id": None},
+        synchronize_session=False)
+    db.commit()
+    return requeued
+
+
+def heartbeat(job_id, worker_id):
+    """Mark a running job as alive, as long as this worker still owns it"""
+    db = SessionLocal()
+    try:
+        db.query(models.ReportJob).filter(
+            models.ReportJob.id == job_id,
+            models.ReportJob.worker_id == worker_id,
+            models.ReportJob.status == "running"
+        ).update({"heartbeat_at": _now()}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+class ReportQueue:
+    """
+    Database-backed report job queue worked by a pool of threads in each API process.
+    Jobs are claimed with a conditional UPDATE, so several processes can share the
+    table; a job left running by a dead worker is requeued once its heartbeat is stale.
+    """
+
+    def __init__(self, workers=REPORT_WORKERS):
+        self.workers = workers
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._processors = OrderedDict()
+        self._processors_lock = threading.Lock()
+
+    def processor(self, session_id, model_version):
+        """Shared DetailedProcessor for a session under a model version"""
+        key = (session_id, model_version)
+        with self._processors_lock:
+            processor = self._processors.get(key)
+            if processor is None:
+                processor = DetailedProcessor(session_id, artifact=get_registry().get(model_version))
+                self._processors[key] = processor
+                while len(self._processors) > MAX_CACHED_PROCESSORS:
+                    self._processors.popitem(last=False)
+            self._processors.move_to_end(key)
+            return processor
+
+    def start(self):
+        if self._threads:
+            return
+        self._stopping.clear()
+        db = SessionLocal()
+        try:
+            requeued = requeue_stale_jobs(db)
+        finally:
+            db.close()
+        if requeued:
+            print(f"Requeued {requeued} interrupted report jobs")
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, args=(f"{self._worker_prefix}:{index}",),
+                                      name=f"report-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """Stop taking jobs; a job in progress is finished, or requeued later if the process exits first"""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        self._wakeup.set()
+
+    def _claim(self, db, worker_id):
+        while True:
+            job = db.query(models.ReportJob.id).filter(
+                models.ReportJob.status == "queued",
+                models.ReportJob.attempts < MAX_ATTEMPTS
+            ).order_by(models.ReportJob.created_at).first()
+            if job is None:
+                return None
+            now = _now()
+            claimed = db.query(models.ReportJob).filter(
+                models.ReportJob.id == job.id,
+                models.ReportJob.status == "queued",
+                models.ReportJob.attempts < MAX_ATTEMPTS
+            ).update({"status": "running", "worker_id": worker_id, "started_at": now, "heartbeat_at": now,
+                      "attempts": models.ReportJob.attempts + 1}, synchronize_session=False)
+            db.commit()
+            if claimed:
+                return db.get(models.ReportJob, job.id)
+            # Another worker claimed it first; try the next one
+
+    def _work(self, worker_id):
+        while not self._stopping.is_set():
+            job = None
+            db = SessionLocal()
+            try:
+                requeue_stale_jobs(db)
+                job = self._claim(db, worker_id)
+                if job is not None:
+                    self.run_job(db, job)
+            except Exception as e:
+                print(f"Report worker {worker_id} error: {e}")
+            finally:
+                db.close()
+            if job is None:
+                self._wakeup.wait(POLL_SECONDS)
+                self._wakeup.clear()
+
+    def _heartbeat(self, job_id, worker_id, done):
+        while not done.wait(HEARTBEAT_SECONDS):
+            try:
+                heartbeat(job_id, worker_id)
+            except Exception as e:
+                print(f"Heartbeat of report job {job_id} failed: {e}")
+
+    def run_job(self, db, job):
+        def progress(stage):
+            job.stage = stage
+            job.progress = REPORT_STAGES[stage]
+            job.heartbeat_at = _now()
+            db.commit()
+
+        # Heartbeat from a timer while the job runs; a single stage can outlast STALE_SECONDS
+        running = threading.Event()
+        beats = threading.Thread(target=self._heartbeat, args=(job.id, job.worker_id, running),
+                                 name=f"report-heartbeat-{job.id[:8]}", daemon=True)
+        beats.start()
+        try:
+            processor = self.processor(job.session_id, job.model_version)
+            if job.application_id not in processor.encoded_df.index:
+                raise LookupError(f"Application {job.application_id} not found in {job.session_id}")
+            _, report_key = processor.report_pdf(job.application_id, progress=progress)
+        except Exception as e:
+            print(f"Report job {job.id} failed (attempt {job.attempts}): {e}")
+            db.rollback()
+            job.error = str(e)
+            # Missing applications or model versions will not appear on a retry
+            retryable = not isinstance(e, (LookupError, FileNotFoundError))
+            if retryable and job.attempts < MAX_ATTEMPTS:
+                job.status, job.stage, job.progress = "queued", "queued", 0.0
+            else:
+                job.status, job.finished_at = "failed", _now()
+            db.commit()
+            return
+        finally:
+            running.set()
+            beats.join()
+
+        # The report scored the application, so write its analysis through for /analysis
+        try:
+            populate_session_analyses(db, processor, [job.application_id])
+        except Exception as e:
+            print(f"Storing the analysis of report job {job.id} failed: {e}")
+            db.rollback()
+
+        job.status = "succeeded"
+        job.report_key = report_key
+        job.error = None
+        job.finished_at = _now()
+        progress("done")
+
+
+report_queue = ReportQueue()
+
+
+def get_report_queue():
+    return report_queue